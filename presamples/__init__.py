@@ -5,7 +5,10 @@ __all__ = [
     'create_presamples_package',
     'FORMATTERS',
     'Indexer',
+    'MemoryPolicy',
+    'MmapPool',
     'RegularPresamplesArrays',
+    'RowsPlan',
     'PackagesDataLoader',
     'PresampleResource',
     'PresamplesPackage',
@@ -17,7 +20,7 @@ __version__ = (0, 2, 6)
 
 from .campaigns import Campaign, PresampleResource
 from .indexer import Indexer
-from .array import RegularPresamplesArrays
+from .array import MemoryPolicy, MmapPool, RegularPresamplesArrays, RowsPlan
 from .packaging import (
     append_presamples_package,
     create_presamples_package,
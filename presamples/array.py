@@ -1,4 +1,205 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import mmap
 import numpy as np
+import os
+import threading
+import weakref
+
+MMAP_ADVICE = ("normal", "random", "sequential", "willneed")
+
+
+class MmapPool:
+    """Process-wide pool of memory-mapped Numpy arrays.
+
+    Keeps at most ``max_open`` arrays mapped; when more are requested, the least
+    recently used array is dropped from the pool, and transparently re-opened
+    the next time it is requested. This bounds the number of open file handles
+    and memory maps of processes using hundreds of presample packages.
+
+    Dropped arrays are not closed explicitly: their memory map is closed when
+    the last reference to it (e.g. a view kept by the caller) is released.
+
+    Files are checked (inode, modification time and size) each time a mapped
+    array is requested, so files rewritten at the same path, e.g. packages
+    created again with ``overwrite=True``, are re-opened instead of serving
+    the old samples.
+
+    Access patterns given to ``advise`` are remembered per filepath, and
+    applied again when an array is re-opened.
+
+    Users of a file (e.g. ``RegularPresamplesArrays``) register with
+    ``acquire``, and unregister with ``release``; the array and its access
+    pattern are dropped when the last user is released.
+
+    Counters:
+
+    * ``opens``: Number of times an array was (re-)opened.
+    * ``hits``: Number of requests served by an array already in the pool.
+    * ``evictions``: Number of arrays dropped from the pool because it was full.
+
+    """
+    def __init__(self, max_open=512):
+        self.max_open = max_open
+        self.opens, self.hits, self.evictions = 0, 0, 0
+        self._arrays = OrderedDict()
+        self._advice = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._arrays)
+
+    def __contains__(self, filepath):
+        return str(filepath) in self._arrays
+
+    @staticmethod
+    def _stamp(key):
+        """(inode, modification time, size) of the file ``key``, or ``None`` if it can't be read"""
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, filepath):
+        """Return the memory-mapped array at ``filepath``"""
+        key = str(filepath)
+        stamp = self._stamp(key)
+        with self._lock:
+            cached = self._arrays.get(key)
+            # Removed files are still served from their existing map
+            if cached is not None and (stamp is None or cached[1] == stamp):
+                self._arrays.move_to_end(key)
+                self.hits += 1
+                return cached[0]
+            arr = np.load(key, mmap_mode='r')
+            self._arrays[key] = (arr, stamp)
+            self._arrays.move_to_end(key)
+            self.opens += 1
+            if key in self._advice:
+                _madvise(arr, self._advice[key])
+            while self.max_open is not None and len(self._arrays) > self.max_open:
+                self._arrays.popitem(last=False)
+                self.evictions += 1
+            return arr
+
+    def advise(self, filepath, pattern):
+        """Apply the access ``pattern`` to the array at ``filepath``, now and when re-opened"""
+        arr = self.get(filepath)
+        with self._lock:
+            self._advice[str(filepath)] = pattern
+        _madvise(arr, pattern)
+
+    def acquire(self, filepaths):
+        """Register one user of each of the arrays at ``filepaths``"""
+        with self._lock:
+            for filepath in filepaths:
+                key = str(filepath)
+                self._users[key] = self._users.get(key, 0) + 1
+
+    def release(self, filepaths):
+        """Unregister one user of each of the arrays at ``filepaths``.
+
+        Arrays without users left are dropped with their access patterns."""
+        with self._lock:
+            for filepath in filepaths:
+                key = str(filepath)
+                users = self._users.get(key, 0) - 1
+                if users > 0:
+                    self._users[key] = users
+                else:
+                    self._users.pop(key, None)
+                    self._arrays.pop(key, None)
+                    self._advice.pop(key, None)
+
+    def discard(self, filepaths):
+        """Drop the arrays at ``filepaths`` and their access patterns from the pool, if present"""
+        with self._lock:
+            for filepath in filepaths:
+                self._arrays.pop(str(filepath), None)
+                self._advice.pop(str(filepath), None)
+
+    def clear(self):
+        """Drop all arrays and reset the counters"""
+        with self._lock:
+            self._arrays.clear()
+            self._advice.clear()
+            self._users.clear()
+            self.opens, self.hits, self.evictions = 0, 0, 0
+
+    @property
+    def stats(self):
+        return {
+            'open': len(self._arrays),
+            'opens': self.opens,
+            'hits': self.hits,
+            'evictions': self.evictions,
+        }
+
+
+MMAP_POOL = MmapPool()
+
+
+def _madvise(arr, pattern):
+    """Apply the access ``pattern`` to the memory map of ``arr``, if any.
+
+    With "random", arrays whose rows are shorter than a page are advised as
+    "sequential", as reading one of their columns touches every page anyway."""
+    mm = getattr(arr, '_mmap', None)
+    if mm is None or not hasattr(mm, 'madvise'):
+        return
+    if pattern == "random" and arr.strides[0] < mmap.PAGESIZE:
+        advice = getattr(mmap, "MADV_SEQUENTIAL", None)
+    else:
+        advice = getattr(mmap, "MADV_" + pattern.upper(), None)
+    if advice is not None:
+        mm.madvise(advice)
+
+
+class MemoryPolicy:
+    """Decide which samples arrays are loaded into RAM instead of being memory-mapped.
+
+    Small arrays pay the mmap and page fault overhead on every access for little
+    memory savings, so arrays of at most ``threshold`` bytes are loaded into RAM
+    as long as the total size of arrays loaded in RAM stays within ``budget``
+    bytes. Larger arrays stay memory-mapped.
+
+    Input arguments:
+
+    * ``threshold``: Maximum size in bytes of arrays loaded into RAM. Default is 1 MiB.
+    * ``budget``: Maximum total size in bytes of arrays loaded into RAM. Optional, default is no limit.
+
+    A single policy can be shared by many ``RegularPresamplesArrays``; ``used`` is the number of bytes loaded into RAM so far.
+
+    """
+    def __init__(self, threshold=2**20, budget=None):
+        self.threshold, self.budget, self.used = threshold, budget, 0
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        """Reserve ``nbytes`` of the RAM budget. Returns ``False`` if over budget."""
+        with self._lock:
+            if self.budget is not None and self.used + nbytes > self.budget:
+                return False
+            self.used += nbytes
+            return True
+
+    def release(self, nbytes):
+        """Give back ``nbytes`` of the RAM budget"""
+        with self._lock:
+            self.used -= nbytes
+
+
+class RowsPlan:
+    """Rows of a ``RegularPresamplesArrays``, grouped by array by ``plan_rows``.
+
+    ``parts`` is a list of (array index, rows in this array, positions in the
+    output); positions are slices when contiguous, as for sorted rows."""
+    __slots__ = ('rows', 'parts')
+
+    def __init__(self, rows, parts):
+        self.rows, self.parts = rows, parts
 
 
 class RegularPresamplesArrays:
@@ -9,21 +210,281 @@ class RegularPresamplesArrays:
     Input arguments:
 
     * ``filepaths``: An iterable of Numpy array filepaths.
+    * ``memory_policy``: A ``MemoryPolicy`` deciding which arrays are loaded into RAM. Optional, by default all arrays are memory-mapped.
+    * ``pool``: The ``MmapPool`` from which memory-mapped arrays are taken. Optional, default is the process-wide ``MMAP_POOL``.
+    * ``shapes``: The shapes of the arrays, e.g. from the package metadata. Optional; if given, with ``dtypes``, arrays are only opened when their data is accessed.
+    * ``dtypes``: The dtypes of the arrays. Only used together with ``shapes``.
+
+    Memory-mapped arrays are not kept open by this class, but requested from the
+    pool on each access, so ``data`` should not be stored by callers.
+
+    When columns are drawn in order (e.g. with a sequential ``Indexer``), call
+    ``read_ahead`` to read blocks of consecutive columns at once.
 
     """
-    def __init__(self, filepaths):
+    def __init__(self, filepaths, memory_policy=None, pool=None, shapes=None, dtypes=None):
         self.count = 0
-        self.data = [
-            np.load(str(fp), mmap_mode='r')
-            for fp in filepaths
-        ]
-        self.start_indices = np.cumsum([0] + [array.shape[0] for array in self.data])
-
-    def sample(self, index):
-        """Draw a new sample from the pre-sampled arrays"""
-        result = np.hstack([arr[:, index] for arr in self.data])
+        self.pool = MMAP_POOL if pool is None else pool
+        self.filepaths = [str(fp) for fp in filepaths]
+        self._pinned = {}
+        if shapes is None or dtypes is None:
+            data = self.data
+            shapes = [array.shape for array in data]
+            dtypes = [array.dtype for array in data]
+        self.start_indices = np.cumsum([0] + [shape[0] for shape in shapes])
+        self.dtype = np.result_type(*dtypes) if dtypes else np.float64
+        self.ncols = shapes[0][1] if shapes else 0
+        # Files used from the pool, released when collected or pinned
+        self._acquired = list(self.filepaths)
+        self.pool.acquire(self._acquired)
+        weakref.finalize(self, self.pool.release, self._acquired)
+        if memory_policy is not None:
+            self.apply_memory_policy(memory_policy)
+        self._buffer = None
+        self.block_size, self._blocks, self._executor, self._ring = None, {}, None, []
+
+    @property
+    def data(self):
+        """List of the (memory-mapped or in RAM) arrays"""
+        return [self.array(i) for i in range(len(self.filepaths))]
+
+    def array(self, i):
+        """Return array ``i``, re-opening it if it was dropped from the pool"""
+        arr = self._pinned.get(i)
+        return self.pool.get(self.filepaths[i]) if arr is None else arr
+
+    @property
+    def buffer(self):
+        """Output array allocated once and reused by callers of ``sample``"""
+        if self._buffer is None:
+            self._buffer = np.empty(self.start_indices[-1], dtype=self.dtype)
+        return self._buffer
+
+    def sample(self, index, out=None, scale=None):
+        """Draw a new sample from the pre-sampled arrays.
+
+        The column ``index`` of each array is copied directly into ``out`` at the
+        offsets given by ``start_indices``. If ``out`` is not given, a new array is
+        allocated; pass ``out=self.buffer`` to avoid allocating on each call.
+
+        If given, the sample is multiplied elementwise by ``scale`` (e.g. signs)
+        while being copied, without a separate pass over ``out``."""
+        if out is None:
+            out = np.empty(self.start_indices[-1], dtype=self.dtype)
+        if self.block_size:
+            start, block = self._get_block(index)
+            if scale is None:
+                out[:] = block[index - start]
+            else:
+                np.multiply(block[index - start], scale, out=out)
+        else:
+            for arr, start, stop in zip(self.data, self.start_indices[:-1], self.start_indices[1:]):
+                if scale is None:
+                    out[start:stop] = arr[:, index]
+                else:
+                    np.multiply(arr[:, index], scale[start:stop], out=out[start:stop])
         self.count += 1
-        return result
+        return out
+
+    def read_ahead(self, block_size, background=False):
+        """Serve samples from blocks of ``block_size`` consecutive columns.
+
+        Each block is read in one pass over each array and kept in RAM, so
+        consecutive column indices don't each need a strided read. If
+        ``background``, the following block is read by a worker thread while
+        the current one is used; the two blocks form a ring buffer of
+        ``2 * block_size`` columns.
+
+        Set ``block_size`` to ``None`` to read columns directly again."""
+        self._wait_for_blocks()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self.block_size, self._blocks = block_size, {}
+        self._executor = ThreadPoolExecutor(max_workers=1) if block_size and background else None
+        if block_size:
+            shape = (min(block_size, self.ncols), self.start_indices[-1])
+            self._ring = [np.empty(shape, dtype=self.dtype) for _ in range(2 if background else 1)]
+        else:
+            self._ring = []
+
+    def pin(self, i):
+        """Load array ``i`` fully into RAM. Returns the number of bytes loaded."""
+        if i in self._pinned:
+            return 0
+        self._pinned[i] = np.array(self.array(i))
+        self._acquired.remove(self.filepaths[i])
+        self.pool.release([self.filepaths[i]])
+        return self._pinned[i].nbytes
+
+    def apply_memory_policy(self, policy):
+        """Load the arrays selected by the ``MemoryPolicy`` ``policy`` into RAM.
+
+        Returns the number of bytes loaded. The reserved bytes are given back to
+        ``policy`` when this object is garbage collected."""
+        total = 0
+        for i, arr in enumerate(self.data):
+            if (i not in self._pinned and arr.nbytes <= policy.threshold
+                    and policy.reserve(arr.nbytes)):
+                total += self.pin(i)
+                weakref.finalize(self, policy.release, arr.nbytes)
+        return total
+
+    def _mmaps(self):
+        """Iterate over (array, ``mmap.mmap``) for the memory-mapped arrays"""
+        for arr in self.data:
+            mm = getattr(arr, '_mmap', None)
+            if mm is not None:
+                yield arr, mm
+
+    def advise(self, pattern):
+        """Tell the kernel how the memory-mapped arrays will be read.
+
+        ``pattern`` is one of "normal", "random", "sequential" or "willneed".
+        With "random", arrays whose rows are shorter than a page are still
+        advised as "sequential", as reading one of their columns touches every
+        page anyway. Does nothing where ``madvise`` isn't available (e.g. on
+        Windows).
+
+        The pattern is kept by the pool, and applied again to arrays re-opened
+        after being dropped from it."""
+        if pattern not in MMAP_ADVICE:
+            raise ValueError("Unknown access pattern {}; must be one of {}".format(
+                pattern, MMAP_ADVICE))
+        for i, filepath in enumerate(self.filepaths):
+            if i not in self._pinned:
+                self.pool.advise(filepath, pattern)
+
+    def prewarm(self):
+        """Fault in all pages of the memory-mapped arrays.
+
+        Reads one byte per page, so that the first samples don't pay for cold
+        page cache reads. Returns the number of bytes mapped."""
+        total = 0
+        for arr, mm in self._mmaps():
+            if hasattr(mm, 'madvise') and hasattr(mmap, "MADV_WILLNEED"):
+                mm.madvise(mmap.MADV_WILLNEED)
+            np.frombuffer(mm, dtype=np.uint8)[::mmap.PAGESIZE].sum()
+            total += len(mm)
+        return total
+
+    def _read_block(self, start, slot):
+        """Read columns ``start`` to ``start + block_size`` into ring buffer ``slot``"""
+        stop = min(start + self.block_size, self.ncols)
+        block = self._ring[slot][:stop - start]
+        for arr, first, last in zip(self.data, self.start_indices[:-1], self.start_indices[1:]):
+            block[:, first:last] = arr[:, start:stop].T
+        return block
+
+    def _wait_for_blocks(self):
+        """Make sure no block is still being read by the worker thread"""
+        for slot, block in self._blocks.values():
+            if isinstance(block, Future):
+                block.result()
+
+    def _get_block(self, index):
+        """Return (first column, block) for the block containing column ``index``"""
+        start = index - index % self.block_size
+        if start not in self._blocks:
+            self._wait_for_blocks()
+            self._blocks = {start: (0, self._read_block(start, 0))}
+        slot, block = self._blocks[start]
+        if isinstance(block, Future):
+            block = block.result()
+            self._blocks[start] = (slot, block)
+        if self._executor is not None:
+            following = start + self.block_size
+            following = following if following < self.ncols else 0
+            if following not in self._blocks:
+                self._blocks = {
+                    start: (slot, block),
+                    following: (1 - slot, self._executor.submit(
+                        self._read_block, following, 1 - slot
+                    )),
+                }
+        return start, block
+
+    def plan_rows(self, rows):
+        """Precompute the reads of ``sample_rows`` for ``rows``.
+
+        Returns a ``RowsPlan`` which can be passed to ``sample_rows`` instead
+        of ``rows``, so that rows drawn at each iteration are not translated and
+        grouped by array again."""
+        rows = np.asarray(rows, dtype=np.intp).ravel()
+        array_indices, array_rows = self.translate_rows(rows)
+        parts = []
+        for i in np.unique(array_indices):
+            positions = np.flatnonzero(array_indices == i)
+            if positions[-1] - positions[0] + 1 == len(positions):
+                positions = slice(int(positions[0]), int(positions[-1]) + 1)
+            parts.append((int(i), array_rows[positions].astype(np.intp), positions))
+        return RowsPlan(rows, parts)
+
+    def sample_rows(self, index, rows, out=None, scale=None):
+        """Draw a new sample for the given rows of the concatenated array only.
+
+        ``rows`` are row indices in the concatenated array, or a ``RowsPlan``
+        from ``plan_rows``. Only these rows are read from each memory-mapped
+        array, so whole columns are not faulted in. Returns values in the order
+        of ``rows``, multiplied by ``scale`` if given."""
+        plan = rows if isinstance(rows, RowsPlan) else self.plan_rows(rows)
+        if out is None:
+            out = np.empty(len(plan.rows), dtype=self.dtype)
+        if self.block_size:
+            start, block = self._get_block(index)
+            self._take(block[index - start], plan.rows, out, slice(None), scale)
+        else:
+            for i, array_rows, positions in plan.parts:
+                self._take(
+                    self.array(i)[:, index], array_rows, out, positions,
+                    None if scale is None else scale[positions]
+                )
+        self.count += 1
+        return out
+
+    @staticmethod
+    def _take(column, rows, out, positions, scale=None):
+        """Copy ``column[rows]``, times ``scale`` if given, into ``out[positions]``.
+
+        Writes in place, without temporary arrays, if ``positions`` is a slice
+        and ``out`` has the dtype of ``column``."""
+        if isinstance(positions, slice) and out.dtype == column.dtype:
+            target = out[positions]
+            np.take(column, rows, out=target, mode='clip')
+            if scale is not None:
+                np.multiply(target, scale, out=target)
+        else:
+            out[positions] = column[rows] if scale is None else column[rows] * scale
+
+    def sample_block(self, indices, rows=None):
+        """Return the columns ``indices`` as one contiguous array.
+
+        The result has shape ``(number of rows, len(indices))``, with rows in the
+        order of the concatenated array, or in the order of ``rows`` if given,
+        in which case only these rows are read."""
+        indices = np.asarray(indices, dtype=np.intp).ravel()
+        if rows is None:
+            out = np.empty((self.start_indices[-1], len(indices)), dtype=self.dtype)
+            for arr, start, stop in zip(self.data, self.start_indices[:-1], self.start_indices[1:]):
+                out[start:stop] = arr[:, indices]
+        else:
+            array_indices, array_rows = self.translate_rows(rows)
+            out = np.empty((len(array_rows), len(indices)), dtype=self.dtype)
+            for i in np.unique(array_indices):
+                mask = array_indices == i
+                out[mask] = self.array(i)[np.ix_(array_rows[mask], indices)]
+        return out
+
+    def translate_rows(self, rows):
+        """Vectorized ``translate_row``.
+
+        Returns a tuple of arrays (array list indices, rows modulo)."""
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        if rows.size and rows.min() < 0:
+            raise ValueError("Row index must be >= 0")
+        if rows.size and rows.max() >= self.start_indices[-1]:
+            raise ValueError("Row index too large")
+        i = np.searchsorted(self.start_indices, rows, side='right') - 1
+        return (i, rows - self.start_indices[i])
 
     def translate_row(self, row):
         """Translate row index from concatenated array to (array list index, row modulo)"""
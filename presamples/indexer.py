@@ -1,3 +1,4 @@
+from collections import deque
 from numpy.random import RandomState
 
 # Max signed 32 bit integer, compatible with Windows
@@ -16,19 +17,36 @@ class Indexer(RandomState):
     def __init__(self, ncols, seed=None):
         self.ncols = ncols
         self.seed_value, self.count, self.index = seed, 0, None
+        self._upcoming = deque()
         super().__init__(None if seed == 'sequential' else seed)
 
-    def __next__(self):
+    def _draw(self, count):
         if self.seed_value == 'sequential':
-            self.index = (self.count % self.ncols)
+            return count % self.ncols
+        else:
+            return self.randint(0, MAX_SIGNED_32BIT_INT) % self.ncols
+
+    def __next__(self):
+        if self._upcoming:
+            self.index = self._upcoming.popleft()
         else:
-            self.index = self.randint(0, MAX_SIGNED_32BIT_INT) % self.ncols
+            self.index = self._draw(self.count)
         self.count += 1
         return self.index
 
+    def peek(self):
+        """Return the next index without advancing the indexer.
+
+        The drawn index is remembered and returned by the following ``next``,
+        so peeking doesn't change the sequence of indices."""
+        if not self._upcoming:
+            self._upcoming.append(self._draw(self.count))
+        return self._upcoming[0]
+
     def reset_sequential_indices(self):
         """Reset index value if this is a sequential indexer.
 
         Used in Monte Carlo calculations."""
         if self.seed_value == 'sequential':
             self.count, self.index = 0, 0
+            self._upcoming.clear()
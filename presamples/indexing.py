@@ -0,0 +1,183 @@
+from collections import OrderedDict
+import hashlib
+import numpy as np
+import threading
+
+# Value of unmapped elements, same as ``bw2calc.indexing.index_with_arrays``
+MAX_INT_32 = 4294967295
+
+
+class MappingLookup:
+    """Sorted-key lookup table built once from a mapping dictionary.
+
+    ``mapping`` links integer keys (e.g. database ids) to matrix indices, like
+    the ``_activity_dict`` of an LCA. Keys and values are stored as sorted
+    arrays, so that any number of keys are mapped with a single ``searchsorted``.
+
+    ``fingerprint`` is a digest of the keys and values; two lookups with the same
+    fingerprint map keys the same way.
+
+    """
+    def __init__(self, mapping):
+        keys = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+        values = np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.values = keys[order], values[order]
+        self._order = order
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            hasher.update(self.keys.tobytes())
+            hasher.update(self.values.tobytes())
+            self._fingerprint = hasher.hexdigest()
+        return self._fingerprint
+
+    def matches(self, mapping):
+        """Check that ``mapping`` still has the keys and values of this lookup.
+
+        Linear in the size of ``mapping``, without sorting or hashing."""
+        if len(mapping) != len(self.keys):
+            return False
+        keys = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+        if not np.array_equal(keys[self._order], self.keys):
+            return False
+        values = np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+        return np.array_equal(values[self._order], self.values)
+
+    def __call__(self, array_from, array_to=None):
+        """Map ``array_from`` keys to values, written to ``array_to`` if given.
+
+        Keys not in the mapping are mapped to ``MAX_INT_32``. Returns the mapped values."""
+        array_from = np.asarray(array_from)
+        if array_to is None:
+            array_to = np.empty(array_from.shape, dtype=np.int64)
+        array_to[...] = MAX_INT_32
+        if not len(self.keys):
+            return array_to
+        positions = np.minimum(
+            np.searchsorted(self.keys, array_from), len(self.keys) - 1
+        )
+        found = self.keys[positions] == array_from
+        array_to[found] = self.values[positions[found]]
+        return array_to
+
+
+class LookupCache:
+    """Cache of ``MappingLookup`` objects, one per mapping dictionary.
+
+    Lookups are found by the identity of the dictionary, and rebuilt if its
+    length changed. Dictionaries edited in place without changing length are
+    only detected with ``get(mapping, verify=True)``, which callers relying on
+    the lookup or its fingerprint for correctness should use. At most
+    ``max_size`` lookups are kept, least recently used first out. References
+    to cached dictionaries are kept, so they are not reused by other objects
+    while cached."""
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._lookups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lookups)
+
+    def get(self, mapping, verify=False):
+        """Return the ``MappingLookup`` for ``mapping``, building it if needed.
+
+        With ``verify``, a cached lookup is also checked against the contents of
+        ``mapping`` (see ``MappingLookup.matches``), and rebuilt if stale."""
+        key = id(mapping)
+        with self._lock:
+            cached = self._lookups.get(key)
+            if cached is not None and cached[0] is mapping and cached[1] == len(mapping):
+                self._lookups.move_to_end(key)
+            else:
+                cached = None
+        if cached is not None and (not verify or cached[2].matches(mapping)):
+            return cached[2]
+        lookup = MappingLookup(mapping)
+        with self._lock:
+            self._lookups[key] = (mapping, len(mapping), lookup)
+            self._lookups.move_to_end(key)
+            while len(self._lookups) > self.max_size:
+                self._lookups.popitem(last=False)
+        return lookup
+
+    def clear(self):
+        with self._lock:
+            self._lookups.clear()
+
+
+LOOKUP_CACHE = LookupCache()
+
+
+class IndicesCache:
+    """Process-wide cache of matrix indices computed by ``PackagesDataLoader.index_arrays``.
+
+    Keys identify a consolidated matrix resource (package id and resource
+    indices and hashes) and the fingerprints of the LCA dictionaries used to
+    index it; values are the computed row and column indices. LCAs built from
+    the same presamples and equal dictionaries can then reuse the indexing.
+    At most ``max_size`` entries are kept, least recently used first out.
+
+    Counters ``hits`` and ``misses`` count cache lookups."""
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits, self.misses = 0, 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached tuple of index arrays for ``key``, or ``None``"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def set(self, key, arrays):
+        """Store copies of the index ``arrays`` for ``key``"""
+        value = tuple(np.array(arr, copy=True) for arr in arrays)
+        for arr in value:
+            arr.flags.writeable = False
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits, self.misses = 0, 0
+
+
+INDICES_CACHE = IndicesCache()
+
+
+def index_arrays_with_lookup(pairs, lookup):
+    """Index many ``(array_from, array_to)`` pairs with one ``lookup`` call.
+
+    The ``array_from`` arrays are concatenated, mapped with a single
+    ``searchsorted``, and the results are written back to each ``array_to``."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+    mapped = lookup(np.concatenate([np.asarray(a, dtype=np.int64) for a, _ in pairs]))
+    start = 0
+    for array_from, array_to in pairs:
+        stop = start + len(array_from)
+        array_to[:] = mapped[start:stop]
+        start = stop
@@ -1,16 +1,27 @@
 from .array import RegularPresamplesArrays
-from .errors import IncompatibleIndices, ConflictingLabels
+from .errors import IncompatibleIndices, ConflictingLabels, InconsistentSampleNumber
 from .indexer import Indexer
+from .indexing import (
+    INDICES_CACHE,
+    LOOKUP_CACHE,
+    MAX_INT_32,
+    MappingLookup,
+    index_arrays_with_lookup,
+)
 from .package_interface import IndexedParametersMapping
-from .utils import validate_presamples_dirpath
+from .utils import validate_presamples_dirpath, validate_presamples_resource
 from pathlib import Path
 import itertools
 import json
 import numpy as np
+import os
 import wrapt
+from scipy import sparse
 from collections.abc import Sequence, Mapping
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import copy
+import weakref
 
 @wrapt.decorator
 def nonempty(wrapped, instance, args, kwargs):
@@ -44,6 +55,40 @@ class PackagesDataLoader:
     lca : Brightway2 LCA object
         Used when ``PackagesDataLoader`` instantiated from LCA (or
         MonteCarloLCA) object.
+    indexer_groups : iterable of iterables, optional
+        Groups of packages that share a single ``Indexer``. Each group is an
+        iterable of package identifiers (dirpath, id or name). Takes precedence
+        over the ``indexer group`` given in the packages' ``datapackage.json``.
+    read_ahead : int, optional
+        For packages with sequential indexers, read blocks of ``read_ahead``
+        consecutive columns at once. See ``RegularPresamplesArrays.read_ahead``.
+    read_ahead_background : bool, default=False
+        Read the next block of columns in a background thread.
+    prefetch : bool, default=False
+        Gather the matrix samples of the next iteration in a background thread
+        while the current iteration is being calculated. See notes below.
+    mmap_advice : bool, default=False
+        Tell the kernel whether samples arrays will be read randomly or
+        sequentially, following the mode of their ``Indexer``.
+    prewarm : bool, default=False
+        Fault in the pages of all samples arrays at load time, using one
+        thread per package (up to the number of CPUs).
+    memory_policy : ``MemoryPolicy``, optional
+        Load small samples arrays into RAM instead of memory-mapping them.
+        Parameter arrays, which are accessed for each name, are considered
+        before matrix arrays when the policy has a RAM budget.
+    matrices : iterable of str, optional
+        Names of the matrices of interest, e.g. ``["technosphere_matrix"]``.
+        Matrix resources for other matrices are not opened, validated or
+        indexed until required. See notes below.
+    parameter_groups : iterable of str, optional
+        Labels of the parameter resources of interest. Other parameter
+        resources are not opened or validated until required.
+    threads : int, optional
+        Gather the samples of matrix resources (including the sign of
+        technosphere inputs) in a pool of ``threads`` worker threads. Matrices
+        are then written once each, in package order, so results are the same
+        as without threads.
 
     Notes
     -----
@@ -52,7 +97,42 @@ class PackagesDataLoader:
     The returned ``PackagesDataLoader`` instance allows access to loaded
     parameter data via the ``parameters`` property.
 
-    2. Using loaded matrix data in LCA
+    2. Indexer groups
+
+    Packages generated from the same underlying run (e.g. correlated samples
+    split over several packages) need to use the same column in each
+    iteration. Packages with the same ``indexer group`` in their
+    ``datapackage.json``, or in the same group in ``indexer_groups``, all use
+    the ``Indexer`` of the first package of the group, so one draw drives
+    all members. All members of a group must have the same number of columns.
+
+    3. Prefetching
+
+    With ``prefetch``, the indices of the next iteration are drawn (without
+    changing the sequence of indices, see ``Indexer.peek``) as soon as
+    ``update_matrices`` returns, and the corresponding samples are gathered
+    by a worker thread while the LCA is factorized and solved. The next call
+    to ``update_matrices`` then only writes the ready samples. If the indexers
+    were moved in the meantime (e.g. ``reset_sequential_indices``), or the
+    resources were indexed again, the prefetched samples are discarded and
+    gathered again. Call ``close`` to stop the worker threads.
+
+    4. Selective loading
+
+    With ``matrices`` or ``parameter_groups``, only the resources of interest
+    are loaded (and their hashes checked) at instantiation. Other resources
+    are loaded by ``require``, which ``update_matrices`` calls for the
+    matrices it is asked to update, so e.g. characterization presamples are
+    only read if LCIA is done.
+
+    5. Several LCAs
+
+    ``update_matrices`` also accepts a collection of LCA instances with the
+    same dictionaries, e.g. for several functional units or methods. Samples
+    are then gathered once per iteration and written to all of them, so
+    that all LCAs use the same draws.
+
+    6. Using loaded matrix data in LCA
 
     When used for LCA within the Brightway2 framework, the
     ``PackagesDataLoader`` instance is an attribute of the ``LCA``
@@ -69,40 +149,165 @@ class PackagesDataLoader:
 
     Warning
     -------
-    Note that we currently assume that all index values in matrix data will be
-    present in the built matrices of the LCA instance. Silent errors or losses
-    in efficiency could happen if this assumption does not hold.
+    Matrix cells whose row or column is not in the dictionaries of the LCA
+    instance are excluded when indexing: they are never read nor inserted.
+    The number of excluded cells is given by the ``unmapped`` property.
     """
-    def __init__(self, dirpaths, seed=None, lca=None):
+    def __init__(self, dirpaths, seed=None, lca=None, indexer_groups=None,
+                 read_ahead=None, read_ahead_background=False, prefetch=False,
+                 mmap_advice=False, prewarm=False, memory_policy=None,
+                 matrices=None, parameter_groups=None, threads=None):
         """Load parameter and matrix data from list presamples package paths"""
         self.seed, self.dirpaths = seed, dirpaths
         self.matrix_data_loaded, self.parameter_data_loaded = [], []
         self.package_indexers, self.matrix_indexer = [], []
         self.lca_reference = lca
+        self.matrices = None if matrices is None else set(matrices)
+        self.parameter_groups = None if parameter_groups is None else set(parameter_groups)
+        selective = matrices is not None or parameter_groups is not None
+        self._sections = []
+        self._array_options = (memory_policy, read_ahead, read_ahead_background, mmap_advice)
+
+        group_labels = {
+            str(identifier): n
+            for n, group in enumerate(indexer_groups or [])
+            for identifier in group
+        }
+        group_indexers = {}
 
         for dirpath in (dirpaths or []):
-            validate_presamples_dirpath(Path(dirpath))
+            # Selected resources are validated by ``load_data``
+            validate_presamples_dirpath(Path(dirpath), check_resources=not selective)
             # Even empty presamples have name and id
-            section = self.load_data(Path(dirpath), self.seed)
+            section = self.load_data(
+                Path(dirpath), self.seed, self.matrices, self.parameter_groups
+            )
+            group = self._get_indexer_group(section, group_labels)
+            if group in group_indexers:
+                self._share_indexer(section, group_indexers[group])
+            elif group is not None:
+                group_indexers[group] = section['indexer']
             self.package_indexers.append(section['indexer'])
-            if section["matrix-data"]:
-                self.matrix_data_loaded.append(
-                    {k:v for k, v in section.items()
-                     if k!='parameter-data'}
-                )
-                self.matrix_indexer.append(section['indexer'])
-            if section['parameter-data']:
-                self.parameter_data_loaded.append(
-                    {k:v for k, v in section.items()
-                     if k!='matrix-data'}
-                )
+            self._sections.append(section)
 
-        # Used for LCA classes; can skip matrix manipulation if no matrix data
-        self.empty = not bool(self.matrix_data_loaded)
+        self._collect_sections()
+        self._configure_arrays(list(self._sample_arrays()))
+        if prewarm:
+            self.prewarm()
+
+        self._prefetched = None
+        self._prefetch_executor = (
+            ThreadPoolExecutor(max_workers=1) if prefetch and not self.empty else None
+        )
+        self._gather_executor = (
+            ThreadPoolExecutor(max_workers=threads) if threads and not self.empty else None
+        )
+        # Update plans are compiled for one generation of matrix indices,
+        # incremented each time resources are loaded or (re)indexed
+        self._update_plans, self._index_generation = {}, 0
+
+        for executor in (self._prefetch_executor, self._gather_executor):
+            if executor is not None:
+                weakref.finalize(self, executor.shutdown, wait=False)
 
-        # Advance to first position on the indices
+        # Advance to first position on the indices; prefetching starts after
+        # the first ``update_matrices``, once resources are indexed
         self.update_package_indices()
 
+    def _collect_sections(self):
+        """Build the lists of loaded matrix and parameter data from the package sections"""
+        self.matrix_data_loaded = [
+            {k:v for k, v in section.items() if k!='parameter-data'}
+            for section in self._sections if section["matrix-data"]
+        ]
+        self.matrix_indexer = [
+            section['indexer'] for section in self._sections if section["matrix-data"]
+        ]
+        self.parameter_data_loaded = [
+            {k:v for k, v in section.items() if k!='matrix-data'}
+            for section in self._sections if section['parameter-data']
+        ]
+        # Used for LCA classes; can skip matrix manipulation if no matrix data
+        self.empty = not bool(self.matrix_data_loaded) and not any(
+            obj.get('matrix')
+            for section in self._sections
+            for obj in section['deferred resources']
+        )
+
+    def _configure_arrays(self, arrays):
+        """Apply the memory policy, read-ahead and advice options to (indexer, samples) ``arrays``"""
+        memory_policy, read_ahead, read_ahead_background, mmap_advice = self._array_options
+        if memory_policy is not None:
+            for _, samples in arrays:
+                samples.apply_memory_policy(memory_policy)
+        if read_ahead:
+            for indexer, samples in arrays:
+                if indexer.seed_value == 'sequential':
+                    samples.read_ahead(read_ahead, read_ahead_background)
+        if mmap_advice:
+            for indexer, samples in arrays:
+                samples.advise(
+                    "sequential" if indexer.seed_value == 'sequential' else "random"
+                )
+
+    def require(self, matrices=(), parameter_groups=()):
+        """Load deferred resources for ``matrices`` and ``parameter_groups``.
+
+        Only needed if the loader was created with ``matrices`` or
+        ``parameter_groups``; resources are validated when loaded. Loaded
+        matrix resources are indexed by the next call to ``index_arrays``,
+        which ``update_matrices`` does for the matrices it requires.
+
+        Returns ``True`` if any resource was loaded."""
+        matrices, parameter_groups = set(matrices), set(parameter_groups)
+        if self.matrices is not None:
+            self.matrices |= matrices
+        if self.parameter_groups is not None:
+            self.parameter_groups |= parameter_groups
+        before = {id(samples) for _, samples in self._sample_arrays()}
+        loaded = False
+        for section in self._sections:
+            wanted = [
+                obj for obj in section['deferred resources']
+                if obj.get('matrix') in matrices
+                or (obj.get('names') and obj.get('label') in parameter_groups)
+            ]
+            if not wanted:
+                continue
+            for obj in wanted:
+                validate_presamples_resource(section['path'], obj)
+            section['deferred resources'] = [
+                obj for obj in section['deferred resources']
+                if not any(obj is other for other in wanted)
+            ]
+            self._load_resources(section, wanted, section['id'])
+            loaded = True
+        if not loaded:
+            return False
+
+        # Prefetched samples don't include the new resources
+        self._collect_prefetch()
+        self._index_generation += 1
+        self._collect_sections()
+        if hasattr(self, "_parameters"):
+            del self._parameters
+        self._configure_arrays([
+            (indexer, samples) for indexer, samples in self._sample_arrays()
+            if id(samples) not in before
+        ])
+        return True
+
+    def close(self):
+        """Shut down the prefetch and gather worker threads.
+
+        The loader can still be used afterwards, without worker threads."""
+        for name in ('_prefetch_executor', '_gather_executor'):
+            executor = getattr(self, name, None)
+            if executor is not None:
+                executor.shutdown()
+                setattr(self, name, None)
+        self._prefetched = None
+
     def __str__(self):
         return "PackagesDataLoader with {} packages:{}".format(
             len(self.dirpaths), ["\n\t{}".format(o) for o in self.dirpaths]
@@ -112,8 +317,61 @@ class PackagesDataLoader:
         """ Return the number of presample packages used to build the loader"""
         return len(self.dirpaths)
 
+    @staticmethod
+    def _get_indexer_group(section, group_labels):
+        """Return the indexer group of a loaded package, or ``None``.
+
+        Groups given at loader construction take precedence over the
+        ``indexer group`` in the package metadata."""
+        for identifier in (section['id'], section['name'], str(section['path'])):
+            if identifier in group_labels:
+                return ('loader', group_labels[identifier])
+        if section['indexer group'] is not None:
+            return ('datapackage', section['indexer group'])
+        return None
+
+    @staticmethod
+    def _share_indexer(section, indexer):
+        """Make the package in ``section`` use the group ``indexer``"""
+        if section['indexer'].ncols != indexer.ncols:
+            raise InconsistentSampleNumber(
+                "Package {} has {} columns, but its indexer group has {}".format(
+                section['name'], section['indexer'].ncols, indexer.ncols
+            ))
+        section['indexer'] = indexer
+        section['parameter-data'].index = indexer
+
+    def prewarm(self, threads=None):
+        """Fault in the pages of all samples arrays, with packages read concurrently.
+
+        ``threads`` defaults to the number of CPUs. Returns the number of bytes mapped."""
+        arrays = [samples for _, samples in self._sample_arrays()]
+        if not arrays:
+            return 0
+        threads = min(len(self), threads or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+            return sum(executor.map(lambda samples: samples.prewarm(), arrays))
+
+    def _sample_arrays(self):
+        """Iterate over (indexer, ``RegularPresamplesArrays``) for all loaded resources.
+
+        Parameter arrays come first, as they are accessed most often."""
+        for obj in self.parameter_data_loaded:
+            yield obj['indexer'], obj['parameter-data'].ipa
+        for obj in self.matrix_data_loaded:
+            for elem in obj['matrix-data']:
+                yield obj['indexer'], elem['samples']
+
+    def _unique_indexers(self):
+        """Iterate over package indexers, skipping repeated shared indexers"""
+        seen = set()
+        for indexer in self.package_indexers:
+            if id(indexer) not in seen:
+                seen.add(id(indexer))
+                yield indexer
+
     @classmethod
-    def load_data(cls, dirpath, seed=None):
+    def load_data(cls, dirpath, seed=None, matrices=None, parameter_groups=None):
         """Load data and metadata from a directory containing a presamples package
 
         Parameters
@@ -123,6 +381,14 @@ class PackagesDataLoader:
         seed: {None, int, array_like, "sequential"}, optional
             Only specify this if you want to override seed value in
             presamples package.
+        matrices: iterable of str, optional
+            Only load matrix resources for these matrices.
+        parameter_groups: iterable of str, optional
+            Only load parameter resources with these labels.
+
+        Resources not selected by ``matrices`` or ``parameter_groups`` are not
+        opened, but listed in ``deferred resources``. If either is given, the
+        selected resources are validated here.
 
         Returns
         -------
@@ -139,31 +405,54 @@ class PackagesDataLoader:
             'id': metadata['id'],
             'seed': metadata['seed'],
             'ncols': metadata['ncols'],
+            'indexer group': metadata.get('indexer group'),
             'matrix-data': [],
             'parameter-data': [],
+            'parameter resources': [],
+            'deferred resources': [],
             # Set default ncols if package is empty
             'indexer': Indexer(metadata['ncols'] or 1, get_seed(metadata['seed']))
         }
+        selected = []
+        for obj in metadata["resources"]:
+            if (obj.get('matrix') and matrices is not None
+                    and obj['matrix'] not in matrices):
+                data['deferred resources'].append(obj)
+            elif (obj.get('names') and parameter_groups is not None
+                    and obj.get('label') not in parameter_groups):
+                data['deferred resources'].append(obj)
+            else:
+                selected.append(obj)
+        if matrices is not None or parameter_groups is not None:
+            for obj in selected:
+                validate_presamples_resource(dirpath, obj)
+        cls._load_resources(data, selected, metadata['id'])
+        return data
+
+    @classmethod
+    def _load_resources(cls, data, resources, package_id):
+        """Add the matrix and parameter ``resources`` to the package ``data``"""
         matrix_resources = [
-            obj for obj in metadata["resources"] if obj.get('matrix')
+            obj for obj in resources if obj.get('matrix')
         ]
         fltr = lambda x: x['type']
         matrix_resources.sort(key=fltr)
         for key, group in itertools.groupby(matrix_resources, fltr):
-            group = cls.consolidate(dirpath, list(group))
+            group = cls.consolidate(data['path'], list(group))
+            group['package id'] = package_id
             data['matrix-data'].append(group)
 
         parameter_resources = [
-            obj for obj in metadata['resources'] if obj.get('names')
+            obj for obj in resources if obj.get('names')
         ]
-
-        data['parameter-data'] = IndexedParametersMapping(
-            path=data['path'],
-            resources=parameter_resources,
-            package_name=data['name'],
-            sample_index=data['indexer']
-        )
-        return data
+        if parameter_resources or not data['parameter-data']:
+            data['parameter resources'].extend(parameter_resources)
+            data['parameter-data'] = IndexedParametersMapping(
+                path=data['path'],
+                resources=data['parameter resources'],
+                package_name=data['name'],
+                sample_index=data['indexer']
+            )
 
     @staticmethod
     def consolidate(dirpath, group):
@@ -196,7 +485,16 @@ class PackagesDataLoader:
 
         SKIP = ('indices', 'samples', 'profile', 'format', 'mediatype')
         result = {k: v for k, v in group[0].items() if k not in SKIP}
-        result.update({'samples': samples, 'indices': indices})
+        # Consolidated indices are only pre-indexed if all resources are
+        for key in ('row dict fingerprint', 'col dict fingerprint'):
+            if len({el.get(key) for el in group}) != 1:
+                result.pop(key, None)
+        result.update({
+            'samples': samples,
+            'indices': indices,
+            # Identifies the consolidated resources, e.g. to cache their indexing
+            'resources': tuple((el.get('index'), el['indices']['md5']) for el in group),
+        })
         return result
 
     @nonempty
@@ -205,10 +503,42 @@ class PackagesDataLoader:
 
         As this function can be called multiple times, we check for each element
         if it has already been called, and whether the required mapping
-        dictionary is present."""
+        dictionary is present.
+
+        One sorted lookup (a ``presamples.indexing.MappingLookup``) is built per
+        LCA dictionary and cached, and all resources using the same dictionary
+        and labels are indexed together with a single ``searchsorted``.
 
-        from bw2calc.indexing import index_with_arrays
+        Computed indices are also stored in the process-wide
+        ``presamples.indexing.INDICES_CACHE``, keyed by package id, resources and
+        fingerprints of the dictionaries, so that other LCAs using the same
+        presamples and equal dictionaries reuse them. Resources pre-indexed at
+        package creation (see ``create_presamples_package``) are not indexed
+        again if they were resolved with the same dictionaries.
 
+        ``lca`` can also be a collection of LCA instances, which are used in turn."""
+        # Samples prefetched before (re)indexing are stale
+        self._collect_prefetch()
+        lcas = self._lca_collection(lca)
+        if len(lcas) != 1:
+            # Resources are indexed by the first LCA with their dictionaries
+            for obj in lcas:
+                self.index_arrays(obj)
+            return
+
+        lca = lcas[0]
+        # Lookups of the LCA dictionaries, checked against their contents once
+        # per call, as their fingerprints key the indices cache
+        lookups = {}
+
+        def lookup(name):
+            if name not in lookups:
+                lookups[name] = LOOKUP_CACHE.get(getattr(lca, name), verify=True)
+            return lookups[name]
+
+        # {dict name: [(array from, array to)]}
+        pending = defaultdict(list)
+        computed, indexed = [], []
         for obj in self.matrix_data_loaded:
             for elem in obj["matrix-data"]:
                 # Allow for iterative indexing, starting with inventory
@@ -222,73 +552,447 @@ class PackagesDataLoader:
                     # This dictionary not yet built
                     continue
 
-                index_with_arrays(
-                    elem['indices'][elem['row from label']],
-                    elem['indices'][elem['row to label']],
-                    getattr(lca, elem['row dict'])
-                )
-                if "col dict" in elem:
-                    index_with_arrays(
-                        elem['indices'][elem['col from label']],
-                        elem['indices'][elem['col to label']],
-                        getattr(lca, elem['col dict'])
-                    )
+                indexed.append(elem)
                 elem['indexed'] = True
+                elem['dict fingerprints'] = self._dict_fingerprints(elem, lookup)
+                if self._pre_indexed(elem, lookup):
+                    # Indices resolved at package creation with the same dictionaries
+                    continue
+
+                labels = self._index_labels(elem)
+                key = self._indices_cache_key(elem, lookup)
+                cached = None if key is None else INDICES_CACHE.get(key)
+                if cached is not None:
+                    for label, arr in zip(labels, cached):
+                        elem['indices'][label] = arr
+                else:
+                    pending[elem['row dict']].append(
+                        (elem['indices'][elem['row from label']], elem['indices'][elem['row to label']])
+                    )
+                    if "col dict" in elem:
+                        pending[elem['col dict']].append(
+                            (elem['indices'][elem['col from label']], elem['indices'][elem['col to label']])
+                        )
+                    if key is not None:
+                        computed.append((key, elem, labels))
+
+        for dict_name, pairs in pending.items():
+            index_arrays_with_lookup(pairs, lookup(dict_name))
+        for key, elem, labels in computed:
+            INDICES_CACHE.set(key, [elem['indices'][label] for label in labels])
+        for elem in indexed:
+            self._drop_unmapped(elem)
+        if indexed:
+            # Indices are rewritten in place; plans compiled before are stale
+            self._index_generation += 1
+
+    @classmethod
+    def _drop_unmapped(cls, elem):
+        """Exclude the cells of ``elem`` missing from the LCA dictionaries.
+
+        Sets ``elem['rows']`` to the rows of the samples array to gather, or
+        ``None`` if all cells are mapped, ``elem['valid indices']`` to the
+        indices of these rows, ``elem['unmapped']`` to the number of
+        excluded cells, and ``elem['signs']`` to the signs of their samples."""
+        valid = np.ones(len(elem['indices']), dtype=bool)
+        for label in cls._index_labels(elem):
+            valid &= elem['indices'][label] != MAX_INT_32
+        elem['unmapped'] = int(len(valid) - valid.sum())
+        if elem['unmapped']:
+            elem['rows'] = np.flatnonzero(valid)
+            elem['valid indices'] = elem['indices'][valid]
+        else:
+            elem['rows'], elem['valid indices'] = None, elem['indices']
+        elem['signs'] = cls._signs(elem)
+
+    @property
+    def unmapped(self):
+        """Number of matrix cells excluded because their row or column is not in the LCA.
+
+        Dictionary of {(package path, matrix name): number of cells}, for indexed
+        resources with excluded cells only."""
+        return {
+            (obj['path'], elem['matrix']): elem['unmapped']
+            for obj in self.matrix_data_loaded
+            for elem in obj["matrix-data"]
+            if elem.get('unmapped')
+        }
+
+    @staticmethod
+    def _pre_indexed(elem, lookup):
+        """Check if the indices of ``elem`` were resolved with the dictionaries of ``lookup``"""
+        prefixes = ('row', 'col') if "col dict" in elem else ('row',)
+        return all(
+            elem.get(prefix + ' dict fingerprint') is not None and
+            elem[prefix + ' dict fingerprint'] ==
+            lookup(elem[prefix + ' dict']).fingerprint
+            for prefix in prefixes
+        )
+
+    @staticmethod
+    def _dict_fingerprints(elem, lookup):
+        """Fingerprints of the dictionaries used to index ``elem``"""
+        dicts = [elem['row dict']] + ([elem['col dict']] if "col dict" in elem else [])
+        return tuple(lookup(name).fingerprint for name in dicts)
+
+    @staticmethod
+    def _lca_collection(lca):
+        """List of LCA instances from ``lca``, a single LCA or a collection of them"""
+        if isinstance(lca, (list, tuple, set, frozenset)):
+            return list(lca)
+        return [lca]
+
+    def _check_dictionaries(self, lcas):
+        """Check that ``lcas`` have the dictionaries used to index their matrix resources.
+
+        Each LCA is only checked again if its dictionaries were replaced, or
+        resources were indexed since. Dictionaries are fingerprinted directly,
+        without filling the bounded ``LOOKUP_CACHE``."""
+        resources = [
+            (elem, [elem['row dict']] + ([elem['col dict']] if "col dict" in elem else []))
+            for obj in self.matrix_data_loaded
+            for elem in obj["matrix-data"]
+            if 'dict fingerprints' in elem
+        ]
+        names = sorted({name for _, dicts in resources for name in dicts})
+        if getattr(self, '_checked_lcas', (None,))[0] != self._index_generation:
+            self._checked_lcas = (self._index_generation, {})
+        checked, fingerprints = self._checked_lcas[1], {}
+
+        for lca in lcas:
+            state = tuple(
+                (id(getattr(lca, name)), len(getattr(lca, name)))
+                if hasattr(lca, name) else None
+                for name in names
+            )
+            if checked.get(id(lca)) == state:
+                continue
+            for elem, dicts in resources:
+                if not hasattr(lca, elem['matrix']):
+                    continue
+                if not all(hasattr(lca, name) for name in dicts):
+                    raise ValueError(
+                        "LCA is missing the dictionaries used to index "
+                        "{} presamples; use one loader per LCA".format(elem['matrix'])
+                    )
+                for name in dicts:
+                    mapping = getattr(lca, name)
+                    if id(mapping) not in fingerprints:
+                        # Keep a reference, so that ids are not reused in this loop
+                        fingerprints[id(mapping)] = (mapping, MappingLookup(mapping).fingerprint)
+                if elem['dict fingerprints'] != tuple(
+                        fingerprints[id(getattr(lca, name))][1] for name in dicts):
+                    raise ValueError(
+                        "LCA dictionaries differ from those used to index "
+                        "{} presamples; use one loader per LCA".format(elem['matrix'])
+                    )
+            checked[id(lca)] = state
+
+    @staticmethod
+    def _index_labels(elem):
+        """Labels of the ``indices`` columns written by ``index_arrays``"""
+        if "col dict" in elem:
+            return (elem['row to label'], elem['col to label'])
+        return (elem['row to label'],)
+
+    @staticmethod
+    def _indices_cache_key(elem, lookup):
+        """Key of ``elem`` in ``INDICES_CACHE``, or ``None`` if it can't be cached"""
+        if elem.get('package id') is None or elem.get('resources') is None:
+            return None
+        dicts = [elem['row dict']] + ([elem['col dict']] if "col dict" in elem else [])
+        return (
+            elem['package id'],
+            elem['resources'],
+            tuple(
+                (elem[prefix + ' from label'], elem[prefix + ' to label'],
+                 lookup(name).fingerprint)
+                for prefix, name in zip(('row', 'col'), dicts)
+            )
+        )
 
     @nonempty
     def update_matrices(self, lca=None, matrices=None, advance_indices=True):
-        """Update the LCA instance matrices from presamples"""
-        from bw2calc.matrices import TechnosphereBiosphereMatrixBuilder as MB
+        """Update the LCA instance matrices from presamples.
 
+        ``lca`` can also be a collection (list, tuple or set) of LCA instances,
+        e.g. for several functional units or methods. The samples of the
+        iteration are then gathered once, and written to the matrices of each
+        LCA, which all get the same draws. All LCAs must have the same
+        dictionaries as the LCA used in ``index_arrays``."""
         lca = self.lca_reference if lca is None else lca
-        if lca is None:
+        lcas = self._lca_collection(lca)
+        if not lcas or any(obj is None for obj in lcas):
             raise ValueError("Must give LCA on instantiation or in this method")
 
-        if matrices is None and advance_indices:
+        if matrices is not None and self.matrices is not None and self.require(matrices=matrices):
+            # Deferred matrix resources loaded on first use
+            self.index_arrays(lca)
+        if len(lcas) > 1:
+            self._check_dictionaries(lcas)
+
+        advance = matrices is None and advance_indices
+        prefetched = self._collect_prefetch()
+        if advance:
             # Advance all the indexers
             self.update_package_indices()
+        if not advance or prefetched is None or prefetched[0] != self._matrix_indices():
+            prefetched = None
 
+        # {matrix name: [(elem, column index)]}, in package order
+        groups = defaultdict(list)
         for indexer, obj in zip(self.matrix_indexer, self.matrix_data_loaded):
             for elem in obj["matrix-data"]:
-                try:
-                    matrix = getattr(lca, elem['matrix'])
-                except AttributeError:
-                    # This LCA doesn't have this matrix
+                targets = [target for target in lcas if hasattr(target, elem['matrix'])]
+                if not targets:
+                    # No LCA has this matrix
                     continue
 
                 if elem['matrix'] == 'technosphere_matrix':
                     # Remove existing matrix factorization
                     # because changing technosphere
-                    if hasattr(lca, "solver"):
-                        delattr(lca, "solver")
+                    for target in targets:
+                        if hasattr(target, "solver"):
+                            delattr(target, "solver")
 
                 if matrices is not None and elem['matrix'] not in matrices:
                     continue
+                groups[elem['matrix']].append((elem, indexer.index))
 
-                sample = elem['samples'].sample(indexer.index)
-                if elem['type'] == 'technosphere':
-                    MB.fix_supply_use(elem['indices'], sample)
-                if 'col dict' in elem:
-                    matrix[
-                        elem['indices'][elem['row to label']],
-                        elem['indices'][elem['col to label']],
-                    ] = sample
-                else:
-                    matrix[
-                        elem['indices'][elem['row to label']],
-                        elem['indices'][elem['row to label']],
-                    ] = sample
+        plans = {
+            name: self._update_plan(name, [elem for elem, _ in group])
+            for name, group in groups.items()
+        }
+        # Prefetched values are only used if gathered for the current plan
+        ready = prefetched[1] if prefetched is not None else {}
+        values = {
+            name: ready[name][1] for name, plan in plans.items()
+            if name in ready and ready[name][0] is plan
+        }
+        values.update({
+            name: gathered for name, (_, gathered) in self._gather({
+                name: group for name, group in groups.items() if name not in values
+            }).items()
+        })
+        for name, plan in plans.items():
+            for target in lcas:
+                if hasattr(target, name):
+                    self._write(getattr(target, name), plan, values[name])
+
+        if advance:
+            self._start_prefetch()
+
+    def _gather(self, groups, buffer='values'):
+        """Gather the values of ``groups`` of {matrix name: [(elem, column index)]}.
+
+        Each matrix is gathered into ``plan[buffer]`` of its update plan, as one
+        vector; resources are gathered by the gather thread pool, if there is one.
+        Returns {matrix name: (plan, values)}."""
+        jobs, results = [], {}
+        for name, group in groups.items():
+            plan = self._update_plan(name, [elem for elem, _ in group])
+            if buffer not in plan:
+                plan[buffer] = np.empty(plan['size'], dtype=plan['dtype'])
+            results[name] = (plan, plan[buffer])
+            for (elem, index), part in zip(group, plan['parts']):
+                jobs.append((elem['samples'], index, part, plan[buffer]))
+
+        def gather(job):
+            samples, index, (rows, scale, start, stop), out = job
+            if rows is None:
+                samples.sample(index, out=out[start:stop], scale=scale)
+            else:
+                samples.sample_rows(index, rows, out=out[start:stop], scale=scale)
+
+        executor = getattr(self, '_gather_executor', None)
+        if executor is None or len(jobs) < 2:
+            for job in jobs:
+                gather(job)
+        else:
+            list(executor.map(gather, jobs))
+        return results
+
+    def _update_plan(self, name, elems):
+        """Compiled plan to update matrix ``name`` from the resources ``elems``.
+
+        Cells repeated within or across resources are only gathered and
+        written once, with the value of the last resource, as if each resource
+        was written in turn. The plan is a dictionary with:
+
+        * ``parts``: For each resource, (``RowsPlan`` of the rows to gather, or ``None`` for all rows; signs; start; stop) of its values in the gathered vector.
+        * ``rows`` and ``cols``: Matrix cells of the gathered values.
+        * ``size`` and ``dtype``: Of the gathered vector.
+        * ``structures``: (indptr, indices, positions in ``data``) for the last CSR matrices written, see ``_write``.
+
+        Plans are cached until resources are loaded or indexed again, as
+        ``index_arrays`` rewrites the indices of ``elems`` in place."""
+        key = (name, self._index_generation) + tuple(id(elem) for elem in elems)
+        plan = self._update_plans.get(key)
+        if plan is not None and all(a is b for a, b in zip(plan['elems'], elems)):
+            return plan
+        # Drop plans of previous generations
+        self._update_plans = {
+            k: v for k, v in self._update_plans.items() if k[1] == self._index_generation
+        }
+        indices = [elem.get('valid indices', elem['indices']) for elem in elems]
+
+        rows = np.concatenate([
+            arr[elem['row to label']] for elem, arr in zip(elems, indices)
+        ]).astype(np.int64)
+        cols = np.concatenate([
+            arr[elem['col to label'] if 'col dict' in elem else elem['row to label']]
+            for elem, arr in zip(elems, indices)
+        ]).astype(np.int64)
+        # Keep the last occurrence of each cell
+        ncols = int(cols.max()) + 1 if len(cols) else 1
+        _, last = np.unique((rows * ncols + cols)[::-1], return_index=True)
+        winners = np.zeros(len(rows), dtype=bool)
+        winners[len(rows) - 1 - last] = True
+
+        parts, start = [], 0
+        bounds = np.cumsum([0] + [len(arr) for arr in indices])
+        for elem, lo, hi in zip(elems, bounds[:-1], bounds[1:]):
+            if 'signs' not in elem:
+                elem['signs'] = self._signs(elem)
+            signs, local = elem['signs'], np.flatnonzero(winners[lo:hi])
+            stop = start + len(local)
+            if len(local) == hi - lo and elem.get('rows') is None:
+                parts.append((None, signs, start, stop))
+            else:
+                sample_rows = local if elem.get('rows') is None else elem['rows'][local]
+                parts.append((
+                    elem['samples'].plan_rows(sample_rows),
+                    None if signs is None else signs[local], start, stop
+                ))
+            start = stop
+
+        plan = {
+            'elems': list(elems),
+            'parts': parts,
+            'rows': rows[winners],
+            'cols': cols[winners],
+            'size': start,
+            'dtype': np.result_type(*[elem['samples'].dtype for elem in elems]),
+            'structures': [],
+        }
+        self._update_plans[key] = plan
+        return plan
+
+    # Number of CSR sparsity structures remembered per update plan
+    MAX_STRUCTURES = 8
+
+    @staticmethod
+    def _write(matrix, plan, values):
+        """Write the gathered ``values`` of update ``plan`` to ``matrix``.
+
+        For CSR matrices whose structure already has all the plan's cells, the
+        values are written directly to ``matrix.data``; the positions are
+        computed once, and reused as long as the sparsity structure is the
+        same, e.g. for the matrices rebuilt at each Monte Carlo iteration.
+        Positions are remembered for the last ``MAX_STRUCTURES`` structures, so
+        that LCAs with different structures (e.g. characterization matrices of
+        several methods) can be updated in turn. Other matrices are updated by
+        item assignment."""
+        positions = None
+        if sparse.isspmatrix_csr(matrix):
+            structures = plan['structures']
+            match = next((
+                n for n, (indptr, indices, _) in enumerate(structures)
+                if matrix.indptr is indptr and matrix.indices is indices
+            ), None)
+            if match is None:
+                match = next((
+                    n for n, (indptr, indices, _) in enumerate(structures)
+                    if np.array_equal(matrix.indptr, indptr) and
+                    np.array_equal(matrix.indices, indices)
+                ), None)
+            if match is not None:
+                positions = structures.pop(match)[2]
+            elif matrix.has_canonical_format:
+                positions = PackagesDataLoader._data_positions(matrix, plan)
+            structures.append((matrix.indptr, matrix.indices, positions))
+            del structures[:-PackagesDataLoader.MAX_STRUCTURES]
+        if positions is None:
+            matrix[plan['rows'], plan['cols']] = values
+        else:
+            matrix.data[positions] = values
+
+    @staticmethod
+    def _data_positions(matrix, plan):
+        """Positions of the cells of ``plan`` in ``matrix.data``, or ``None`` if some are missing"""
+        nrows, ncols = matrix.shape
+        entries = np.repeat(np.arange(nrows, dtype=np.int64), np.diff(matrix.indptr))
+        keys = entries * ncols + matrix.indices
+        wanted = plan['rows'] * ncols + plan['cols']
+        positions = np.searchsorted(keys, wanted)
+        if len(wanted) and (positions.max() >= len(keys) or
+                            not np.array_equal(keys[positions], wanted)):
+            return None
+        return positions
+
+    @staticmethod
+    def _signs(elem):
+        """Signs of the samples of resource ``elem``, or ``None`` if all are positive.
+
+        Technosphere inputs are negative, as with
+        ``TechnosphereBiosphereMatrixBuilder.fix_supply_use``."""
+        if elem['type'] != 'technosphere':
+            return None
+        from bw2calc.matrices import TechnosphereBiosphereMatrixBuilder as MB
+
+        indices = elem.get('valid indices', elem['indices'])
+        mask = MB.get_technosphere_inputs_mask(indices)
+        if not len(mask[0]):
+            return None
+        signs = np.ones(len(indices), dtype=elem['samples'].dtype)
+        signs[mask] = -1
+        return signs
+
+    def _matrix_indices(self):
+        return [indexer.index for indexer in self.matrix_indexer]
+
+    def _prefetch(self, indices):
+        """Gather the samples of all resources for the given indexer indices.
+
+        Runs in the prefetch worker thread, and writes into separate buffers
+        so that it never competes with ``update_matrices``."""
+        groups = defaultdict(list)
+        for index, obj in zip(indices, self.matrix_data_loaded):
+            for elem in obj["matrix-data"]:
+                groups[elem['matrix']].append((elem, index))
+        return self._gather(groups, 'prefetch values')
+
+    def _start_prefetch(self):
+        """Draw the next indices and start gathering their samples"""
+        if self._prefetch_executor is None:
+            return
+        indices = [indexer.peek() for indexer in self.matrix_indexer]
+        self._prefetched = (
+            indices, self._prefetch_executor.submit(self._prefetch, indices)
+        )
+
+    def _collect_prefetch(self):
+        """Wait for the prefetch worker to finish.
+
+        Returns ``(indices, samples)``, or ``None`` if nothing was prefetched."""
+        if getattr(self, '_prefetched', None) is None:
+            return None
+        indices, future = self._prefetched
+        self._prefetched = None
+        return indices, future.result()
 
     def update_package_indices(self):
-        """Move to next index"""
-        for indexer in self.package_indexers:
+        """Move to next index.
+
+        Indexers shared by an indexer group are only advanced once."""
+        for indexer in self._unique_indexers():
             next(indexer)
 
     def reset_sequential_indices(self):
         """Reset all sequential indexers.
 
         Needed for Monte Carlo calculations."""
-        for indexer in self.package_indexers:
+        for indexer in self._unique_indexers():
             indexer.reset_sequential_indices()
 
     @property
@@ -338,7 +1042,8 @@ class ConsolidatedIndexedParameterMapping(Mapping):
       identifying the IndexedParameterMapping used for a given
       named parameter.
     - ``consolidated_array``: array of shape (n,) values, giving access
-      to the values for the *n* named parameters
+      to the values for the *n* named parameters. Built with one gather
+      per IndexedParameterMapping, reading only the rows it provides
     - ``consolidated_index``: array of shape (n,) values, giving access
       to the index values for the *n* named parameters in their
       respective IndexedParameterMapping
@@ -366,30 +1071,79 @@ class ConsolidatedIndexedParameterMapping(Mapping):
 
     def __getitem__(self, name):
         """Return value for given parameter, at current index in corresponding IPM"""
-        i = self.names.index(name)
-        return self.consolidated_array[i]
+        return self.ipms[self.ipm_mapper[name]][name]
+
+    def __contains__(self, name):
+        return name in self.ipm_mapper
 
     def __iter__(self):
         """Iterate through unique parameter names"""
         return iter(self.names)
 
+    def position(self, name):
+        """Position of parameter ``name`` in ``names`` and ``consolidated_array``"""
+        return self._name_index[name]
 
     def _consolidate_ipms(self):
-        """Map parameter names to source package and values"""
-        self.names = []
+        """Map parameter names to source package and values.
+
+        Linear in the total number of names: ``ipm_mapper`` is filled in order
+        of first appearance, and gives ``names``; the ``ids`` of an overridden
+        name already identify the package it is replaced from."""
         self.ids = {}
         self.ipm_mapper = {}
         self.replaced = defaultdict(list)
         for i, ipm in enumerate(self.ipms):
-            for n, name in enumerate(ipm.names):
-                if name not in self.names:
-                    self.names.append(name)
-                else:
-                    old_ipm = self.ipms[self.ipm_mapper[name]]
-                    ind_index = list(old_ipm.mapping.keys()).index(name)
-                    self.replaced[name].append((old_ipm.ids[ind_index][0], old_ipm.ids[ind_index][1]))
-                self.ids[name] = ipm.ids[n]
+            for name, id_ in zip(ipm.names, ipm.ids):
+                if name in self.ipm_mapper:
+                    self.replaced[name].append(self.ids[name][:2])
+                self.ids[name] = id_
                 self.ipm_mapper[name] = i
+        self.names = list(self.ipm_mapper)
+        self._build_gather_plans()
+
+    def _build_gather_plans(self):
+        """Precompute, for each IPM, the positions in ``consolidated_array`` of
+        the parameters it provides, their rows in its samples arrays, the
+        ``RowsPlan`` of these rows and an output buffer for ``sample_rows``."""
+        self._name_index = {name: i for i, name in enumerate(self.names)}
+        positions = [[] for _ in self.ipms]
+        rows = [[] for _ in self.ipms]
+        for i, name in enumerate(self.names):
+            n = self.ipm_mapper[name]
+            positions[n].append(i)
+            rows[n].append(self.ipms[n].row(name))
+        self._gather_plans = []
+        for ipm, p, r in zip(self.ipms, positions, rows):
+            r = np.array(r, dtype=np.intp)
+            self._gather_plans.append((
+                np.array(p, dtype=np.intp), r,
+                ipm.ipa.plan_rows(r) if len(r) else None,
+                np.empty(len(r), dtype=ipm.ipa.dtype),
+            ))
+
+    def block(self, indices):
+        """Values of all named parameters for several sample columns.
+
+        ``indices`` is either a sequence of column indices used for every
+        IndexedParameterMapping, or a sequence with one such sequence per
+        IndexedParameterMapping (in the order of ``ipms``), e.g. to follow
+        each package's own ``Indexer`` over a range of iterations.
+
+        Returns a contiguous array of shape ``(len(names), number of
+        columns)``, with rows in the order of ``names``."""
+        indices = np.asarray(indices, dtype=np.intp)
+        if indices.ndim == 1:
+            indices = np.broadcast_to(indices, (len(self.ipms), len(indices)))
+        elif indices.ndim != 2 or indices.shape[0] != len(self.ipms):
+            raise ValueError(
+                "Give one sequence of indices, or one per IndexedParameterMapping"
+            )
+        arr = np.empty(shape=(len(self.names), indices.shape[1]))
+        for ipm, cols, (positions, rows, _, _) in zip(self.ipms, indices, self._gather_plans):
+            if len(positions):
+                arr[positions] = ipm.ipa.sample_block(cols, rows)
+        return arr
 
     @property
     def consolidated_indices(self):
@@ -407,6 +1161,7 @@ class ConsolidatedIndexedParameterMapping(Mapping):
         parameter and the current Indexer value.
         """
         arr = np.empty(shape=(len(self.names)))
-        for i, name in enumerate(self.names):
-            arr[i] = self.ipms[self.ipm_mapper[name]][name]
+        for ipm, (positions, _, plan, buffer) in zip(self.ipms, self._gather_plans):
+            if len(positions):
+                arr[positions] = ipm.ipa.sample_rows(ipm.index, plan, out=buffer)
         return arr
@@ -0,0 +1,119 @@
+from .errors import NameConflicts
+from collections.abc import Sequence
+import hashlib
+import json
+import numpy as np
+
+# File layout, all integers little-endian:
+# * header: magic (8 bytes), number of names, hash table size, blob size (uint64)
+# * offsets: uint64[number of names + 1], start of each name in the blob
+# * table: int64[hash table size], name index or -1 if the slot is empty
+# * blob: UTF-8 encoded names, concatenated
+MAGIC = b'PSNAMES\x01'
+HEADER_SIZE = 32
+
+
+def name_hash(encoded):
+    """Stable 64 bit hash of an UTF-8 encoded name"""
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), 'little')
+
+
+def write_names(filepath, names):
+    """Write ``names`` to ``filepath`` in the binary names format.
+
+    Raises ``NameConflicts`` if ``names`` has duplicates."""
+    encoded = [str(name).encode('utf-8') for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(x) for x in encoded])
+    # Power of two at least twice the number of names, so probes stay short
+    size = 1 << max(1, 2 * len(encoded) - 1).bit_length()
+    table = np.full(size, -1, dtype='<i8')
+    for i, name in enumerate(encoded):
+        slot = name_hash(name) % size
+        while table[slot] != -1:
+            if encoded[table[slot]] == name:
+                raise NameConflicts("Non-unique name: {}".format(names[i]))
+            slot = (slot + 1) % size
+        table[slot] = i
+    blob = b''.join(encoded)
+    header = np.array([len(encoded), size, len(blob)], dtype='<u8')
+    with open(filepath, 'wb') as f:
+        f.write(MAGIC)
+        f.write(header.tobytes())
+        f.write(offsets.tobytes())
+        f.write(table.tobytes())
+        f.write(blob)
+
+
+class NamesIndex(Sequence):
+    """Read-only, memory-mapped sequence of parameter names in the binary names format.
+
+    Names are only decoded when accessed, and ``index`` and ``in`` use the
+    on-disk hash table, so looking up a name doesn't require reading all names.
+
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        data = np.memmap(filepath, dtype=np.uint8, mode='r')
+        if bytes(data[:8]) != MAGIC:
+            raise ValueError("{} is not a presamples names file".format(filepath))
+        n, size, blob_size = (int(x) for x in data[8:HEADER_SIZE].view('<u8'))
+        start = HEADER_SIZE
+        self.offsets = data[start:start + 8 * (n + 1)].view('<u8')
+        start += 8 * (n + 1)
+        self.table = data[start:start + 8 * size].view('<i8')
+        start += 8 * size
+        self.blob = data[start:start + blob_size]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _encoded(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Name index out of range")
+        return self._encoded(i).decode('utf-8')
+
+    def __iter__(self):
+        blob = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            yield blob[start:stop].decode('utf-8')
+
+    def get(self, name, default=None):
+        """Position of ``name``, or ``default`` if not present"""
+        encoded = str(name).encode('utf-8')
+        size = len(self.table)
+        slot = name_hash(encoded) % size
+        while self.table[slot] != -1:
+            if self._encoded(self.table[slot]) == encoded:
+                return int(self.table[slot])
+            slot = (slot + 1) % size
+        return default
+
+    def index(self, name):
+        """Position of ``name``; raises ``ValueError`` if not present"""
+        i = self.get(name)
+        if i is None:
+            raise ValueError("{} is not in names".format(name))
+        return i
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+
+def load_names(dirpath, resource):
+    """Load the names of parameter ``resource`` in package at ``dirpath``.
+
+    Returns a list for JSON names files, and a ``NamesIndex`` for binary names files."""
+    filepath = dirpath / resource['names']['filepath']
+    if resource['names'].get('format') == 'psnames':
+        return NamesIndex(filepath)
+    with open(filepath, encoding='utf-8') as f:
+        return json.load(f)
@@ -1,10 +1,18 @@
 from .array import RegularPresamplesArrays
 from .indexer import Indexer
-from .utils import validate_presamples_dirpath, check_name_conflicts
+from .names import load_names
+from .utils import (
+    check_name_conflicts,
+    validate_presamples_dirpath,
+    validate_presamples_resource,
+)
 from collections.abc import Mapping
 from collections import OrderedDict
 from pathlib import Path
+import copy
 import json
+import numpy as np
+import os
 
 
 class PresamplesPackage:
@@ -50,16 +58,33 @@ class PresamplesPackage:
 
     The ``resources`` list should have at least one resource. Multiple resources of different types can be present in a single datapackage. The field ``{data package index}`` doesn't have to be consecutive integers, but should be unique for each resource. If there is only one set of samples, it can be omitted entirely.
 
+    By default, the MD5 hash of every data file is checked when the package is created. With ``lazy=True``, only ``datapackage.json`` is read; the data files of each resource are checked for existence and size when they are first used, and ``validate`` checks all hashes on demand. This makes inspecting large packages (e.g. their ``name`` or a few parameters) cheap.
+
     """
-    def __init__(self, path):
+    def __init__(self, path, lazy=False):
         self.path = Path(path)
-        validate_presamples_dirpath(path)
+        self.lazy = lazy
+        self._metadata, self._metadata_stamp = None, None
+        validate_presamples_dirpath(path, check_resources=not lazy)
         self.indexer = Indexer(self.ncols, self.seed)
         next(self.indexer)
 
+    def _stamp(self):
+        stat = os.stat(self.path / "datapackage.json")
+        return (stat.st_mtime_ns, stat.st_size)
+
     @property
     def metadata(self):
-        return json.load(open(self.path / "datapackage.json"))
+        """Contents of ``datapackage.json``.
+
+        Parsed once and cached until the file is modified; the returned dict
+        is shared, and should not be modified."""
+        stamp = self._stamp()
+        if self._metadata is None or stamp != self._metadata_stamp:
+            with open(self.path / "datapackage.json", encoding='utf-8') as f:
+                self._metadata = json.load(f)
+            self._metadata_stamp = stamp
+        return self._metadata
 
     @property
     def name(self):
@@ -75,10 +100,18 @@ class PresamplesPackage:
 
     def change_seed(self, new):
         """Change seed to ``new``"""
-        current = self.metadata
+        current = copy.deepcopy(self.metadata)
         current['seed'] = new
         with open(self.path / "datapackage.json", "w", encoding='utf-8') as f:
             json.dump(current, f, indent=2, ensure_ascii=False)
+        self._metadata, self._metadata_stamp = current, self._stamp()
+
+    def validate(self):
+        """Check the MD5 hashes of all data files, and that parameter names are unique"""
+        validate_presamples_dirpath(self.path)
+        check_name_conflicts(
+            load_names(self.path, obj) for obj in self.resources if obj.get('names')
+        )
 
     @property
     def id(self):
@@ -91,31 +124,120 @@ class PresamplesPackage:
     def __len__(self):
         return len(self.resources)
 
+    @property
+    def summaries(self):
+        """Per-row summary statistics of each resource, read without touching the samples.
+
+        Structured arrays with fields ``mean``, ``std``, ``min``, ``max`` and
+        ``quantiles`` (at the levels given by ``resource['summary']['quantiles']``),
+        or ``None`` for resources without summary statistics."""
+        if not hasattr(self, "_summaries"):
+            self._summaries = [load_summary(self.path, obj) for obj in self.resources]
+        return self._summaries
+
     @property
     def parameters(self):
         if not hasattr(self, "_parameters"):
-            self._parameters = ParametersMapping(self.path, self.resources, self.name)
+            self._parameters = ParametersMapping(
+                self.path, self.resources, self.name, lazy=self.lazy
+            )
         return self._parameters
 
 
+def load_summary(path, resource):
+    """Load the summary statistics of ``resource``, or ``None`` if it has none"""
+    if 'summary' not in resource:
+        return None
+    return np.load(path / resource['summary']['filepath'], allow_pickle=False)
+
+
 class ParametersMapping(Mapping):
-    def __init__(self, path, resources, package_name):
-        name_lists = [
-            json.load(open(path / obj['names']['filepath'])) for obj in resources
-            if obj.get('names')
-        ]
-        check_name_conflicts(name_lists)
-        self.mapping = OrderedDict(
+    """Named parameters of a presamples package, mapped to their samples.
+
+    Names stored as JSON lists are all read when the mapping is created. Names
+    stored in the binary format (see ``presamples.names``) are looked up with
+    their hash index, so that ``in`` and item access don't read all names.
+
+    With ``lazy=True``, names and samples of each resource are only read when
+    needed, after a cheap check of its data files; name lookups stop at the
+    first resource with the name, and name conflicts are not checked."""
+    def __init__(self, path, resources, package_name, lazy=False):
+        self.path, self.package_name, self.lazy = path, package_name, lazy
+        self.resources = [obj for obj in resources if obj.get('names')]
+        self._name_lists = [None] * len(self.resources)
+        self._checked, self._summaries = set(), {}
+        self._mapping, self._ids = None, None
+        if not lazy:
+            if all(isinstance(lst, list) for lst in self.name_lists):
+                check_name_conflicts(self.name_lists)
+                self._mapping = self._build_mapping()
+        # Either a ``NamesIndex`` or a dict, both giving rows with ``.get(name)``
+        self._rows = [None] * len(self.resources)
+        shapes = [obj['samples'].get('shape') for obj in self.resources]
+        dtypes = [obj['samples'].get('dtype') for obj in self.resources]
+        self.ipa = RegularPresamplesArrays(
+            [path / obj['samples']['filepath'] for obj in self.resources],
+            shapes=shapes if all(shapes) and all(dtypes) else None,
+            dtypes=dtypes if all(shapes) and all(dtypes) else None,
+        )
+
+    def _check(self, i):
+        """Check the data files of resource ``i`` before its first use, if lazy"""
+        if self.lazy and i not in self._checked:
+            validate_presamples_resource(self.path, self.resources[i], check_hash=False)
+            self._checked.add(i)
+
+    def _names(self, i):
+        if self._name_lists[i] is None:
+            self._check(i)
+            self._name_lists[i] = load_names(self.path, self.resources[i])
+        return self._name_lists[i]
+
+    @property
+    def name_lists(self):
+        """Names of each resource. Reads all names files."""
+        return [self._names(i) for i in range(len(self.resources))]
+
+    def _row_index(self, i):
+        if self._rows[i] is None:
+            lst = self._names(i)
+            self._rows[i] = {name: j for j, name in enumerate(lst)} \
+                if isinstance(lst, list) else lst
+        return self._rows[i]
+
+    def _array(self, i):
+        self._check(i)
+        return self.ipa.array(i)
+
+    def _build_mapping(self):
+        return OrderedDict(
             (name, (i, j))
-            for i, lst in enumerate(name_lists)
+            for i, lst in enumerate(self.name_lists)
             for j, name in enumerate(lst)
         )
-        self.ipa = RegularPresamplesArrays([
-            path / obj['samples']['filepath']
-            for obj in resources
-            if obj.get('names')
-        ])
-        self.ids = [(path, package_name, name) for name in self.mapping]
+
+    @property
+    def mapping(self):
+        """OrderedDict of {name: (resource number, row)}. Reads all names."""
+        if self._mapping is None:
+            self._mapping = self._build_mapping()
+        return self._mapping
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = [(self.path, self.package_name, name) for name in self]
+        return self._ids
+
+    def _locate(self, name):
+        """Return (resource number, row) of parameter ``name``"""
+        if self._mapping is not None:
+            return self._mapping[name]
+        for i in range(len(self.resources)):
+            j = self._row_index(i).get(name)
+            if j is not None:
+                return (i, j)
+        raise KeyError(name)
 
     def items(self):
         for key in self.mapping:
@@ -123,24 +245,55 @@ class ParametersMapping(Mapping):
 
     def values(self):
         for i, j in self.mapping.values():
-            yield self.ipa.data[i][j, :]
+            yield self._array(i)[j, :]
 
     @property
     def names(self):
         return list(self.keys())
 
+    def block(self, indices):
+        """Values of all parameters for the sample columns ``indices``.
+
+        Returns a contiguous array of shape ``(len(self), len(indices))``, with
+        rows in the order of ``names``."""
+        for i in range(len(self.resources)):
+            self._check(i)
+        return self.ipa.sample_block(indices)
+
+    def summary(self, name):
+        """Summary statistics of parameter ``name``, if stored in the package.
+
+        Returns a record with the fields ``mean``, ``std``, ``min``, ``max`` and ``quantiles``."""
+        i, j = self._locate(name)
+        if i not in self._summaries:
+            self._summaries[i] = load_summary(self.path, self.resources[i])
+        if self._summaries[i] is None:
+            raise ValueError("No summary statistics stored for {}".format(name))
+        return self._summaries[i][j]
+
+    def row(self, name):
+        """Row of parameter ``name`` in the concatenated samples arrays ``ipa``"""
+        i, j = self._locate(name)
+        return int(self.ipa.start_indices[i]) + j
+
     def __getitem__(self, key):
-        i, j = self.mapping[key]
-        return self.ipa.data[i][j, :]
+        i, j = self._locate(key)
+        return self._array(i)[j, :]
 
     def __len__(self):
-        return len(self.mapping)
+        return int(self.ipa.start_indices[-1])
 
     def __contains__(self, key):
-        return key in self.mapping
+        try:
+            self._locate(key)
+            return True
+        except KeyError:
+            return False
 
     def __iter__(self):
-        return iter(self.mapping)
+        if self._mapping is not None:
+            return iter(self._mapping)
+        return (name for i in range(len(self.resources)) for name in self._names(i))
 
 
 class IndexedParametersMapping(ParametersMapping):
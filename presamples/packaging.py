@@ -9,6 +9,8 @@ import copy
 import warnings
 
 from .errors import InconsistentSampleNumber, ShapeMismatch, NameConflicts
+from .indexing import LOOKUP_CACHE
+from .names import load_names, write_names
 from .utils import validate_presamples_dirpath, md5
 
 try:
@@ -28,6 +30,9 @@ except ImportError:
 # Max signed 32 bit integer, compatible with Windows
 MAX_SIGNED_32BIT_INT = 2147483647
 
+# Quantiles stored in the summary statistics of each resource
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
 to_array = lambda x: np.array(x) if not isinstance(x, np.ndarray) else x
 to_2d = lambda x: np.reshape(x, (1, -1)) if len(x.shape) == 1 else x
 
@@ -237,7 +242,8 @@ def get_presample_directory(id_, overwrite=False, dirpath=None):
 
 
 def create_presamples_package(matrix_data=None, parameter_data=None, name=None,
-        id_=None, overwrite=False, dirpath=None, seed=None, collapse_repeated_indices=True):
+        id_=None, overwrite=False, dirpath=None, seed=None, collapse_repeated_indices=True,
+        indexer_group=None, names_format="json", summary_statistics=False, pre_index=None):
     """Create and populate a new presamples package
 
      The presamples package minimally contains a datapackage file with metadata on the
@@ -263,6 +269,23 @@ def create_presamples_package(matrix_data=None, parameter_data=None, name=None,
         collapse_repeated_indices: bool, default=True
             Indicates whether samples for the same matrix cell in a given array should be summed.
             If False then only the last sample values are used.
+        indexer_group: str, optional
+            Label of the indexer group of this package. All packages with the same
+            indexer group loaded in a ``PackagesDataLoader`` share a single ``Indexer``,
+            i.e. they use the same column in each iteration.
+        names_format: {"json", "binary"}, default="json"
+            Format of the files storing parameter names. "binary" files are memory-mapped
+            and include a hash index, so that names can be looked up without reading all
+            names; use it for packages with many named parameters.
+        summary_statistics: bool, default=False
+            If True, store the mean, standard deviation, minimum, maximum and quantiles
+            of each row of each samples array in a small side array, available as
+            ``PresamplesPackage.summaries`` without reading the samples.
+        pre_index: LCA, optional
+            An LCA (or any object with the LCA dictionaries as attributes, e.g.
+            ``_activity_dict``) for a frozen database and matrix layout. Matrix indices are
+            resolved with its dictionaries and stored with their fingerprints, so that
+            ``PackagesDataLoader.index_arrays`` can skip them for LCAs with the same dictionaries.
 
     Notes
     ----
@@ -299,6 +322,8 @@ def create_presamples_package(matrix_data=None, parameter_data=None, name=None,
         "seed": seed,
         "resources": []
     }
+    if indexer_group is not None:
+        datapackage["indexer group"] = str(indexer_group)
 
     if not matrix_data and not parameter_data:
         raise ValueError("Must specify at least one of `matrix_data` and `parameter_data`")
@@ -341,7 +366,11 @@ def create_presamples_package(matrix_data=None, parameter_data=None, name=None,
             error = "Shape mismatch between samples and indices: {}, {}, {}"
             raise ShapeMismatch(error.format(samples.shape, indices.shape, kind))
 
+        if pre_index is not None:
+            metadata = dict(metadata, **pre_index_matrix_data(indices, metadata, pre_index))
         result = write_matrix_data(samples, indices, metadata, kind, dirpath, index, id_)
+        if summary_statistics:
+            result['summary'] = write_summary_statistics(samples, dirpath, index, id_)
         datapackage['resources'].append(result)
 
     names = [
@@ -381,7 +410,10 @@ def create_presamples_package(matrix_data=None, parameter_data=None, name=None,
                 "{} and {}".format(samples.shape[1], num_iterations))
 
         result = write_parameter_data(samples, names, label, dirpath,
-                                            offset + index, id_)
+                                            offset + index, id_, names_format)
+        if summary_statistics:
+            result['summary'] = write_summary_statistics(
+                samples, dirpath, offset + index, id_)
         datapackage['resources'].append(result)
 
     datapackage['ncols'] = num_iterations
@@ -392,7 +424,8 @@ def create_presamples_package(matrix_data=None, parameter_data=None, name=None,
     return id_, dirpath
 
 
-def append_presamples_package(dirpath, matrix_data=None, parameter_data=None, collapse_repeated_indices=True):
+def append_presamples_package(dirpath, matrix_data=None, parameter_data=None, collapse_repeated_indices=True,
+                              names_format="json", summary_statistics=False, pre_index=None):
     """Append new sections to a presamples package.
 
     ``dirpath`` is the directory where the existing presamples can be found.
@@ -401,6 +434,12 @@ def append_presamples_package(dirpath, matrix_data=None, parameter_data=None, co
 
     ``collapse_repeated_indices`` is a boolean indicating whether samples for the same matrix cell in a given array should be summed. The default is True, if False then only the last sample values are used.
 
+    ``names_format`` is the format of the new parameter names files, either "json" (default) or "binary"; see ``create_presamples_package``.
+
+    ``summary_statistics`` is a boolean indicating whether per-row summary statistics of the new samples arrays are stored; see ``create_presamples_package``.
+
+    ``pre_index`` is an optional LCA whose dictionaries are used to resolve and store the row and column indices of the new matrix data; see ``create_presamples_package``.
+
     Both matrix and parameter data should have the same number of possible values (i.e same number of samples).
 
     The following arguments are optional:
@@ -456,25 +495,33 @@ def append_presamples_package(dirpath, matrix_data=None, parameter_data=None, co
             error = "Shape mismatch between samples and indices: {}, {}, {}"
             raise ShapeMismatch(error.format(samples.shape, indices.shape, kind))
 
+        if pre_index is not None:
+            metadata = dict(metadata, **pre_index_matrix_data(indices, metadata, pre_index))
         result = write_matrix_data(
             samples, indices, metadata, kind,
             dirpath, index + offset, datapackage['id']
         )
+        if summary_statistics:
+            result['summary'] = write_summary_statistics(
+                samples, dirpath, index + offset, datapackage['id'])
         datapackage['resources'].append(result)
 
     if parameter_data:
-        filepaths = [dirpath / resource['names']['filepath'] for resource in datapackage['resources'] if 'names' in resource]
-        old_names = [name for fp in filepaths for name in json.load(open(fp))]
+        # Binary names files are checked with their hash index, without reading all names
+        old_names = [
+            load_names(dirpath, resource) for resource in datapackage['resources']
+            if 'names' in resource
+        ]
+        old_names = [set(x) if isinstance(x, list) else x for x in old_names]
         names = [
             name for _, names, _ in elems(parameter_data or [], "parameter_data")
             for name in names
         ]
-        print(old_names)
-        print(names)
-        if set(old_names).intersection(set(names)):
+        conflicts = {name for name in names if any(name in x for x in old_names)}
+        if conflicts:
             raise NameConflicts(
                 "Named parameters already defined in existing package: {}".format(
-                set(old_names).intersection(set(names))
+                conflicts
             ))
 
         num_names = len(names)
@@ -503,8 +550,11 @@ def append_presamples_package(dirpath, matrix_data=None, parameter_data=None, co
 
         result = write_parameter_data(
             samples, names, label, dirpath,
-            offset + index, datapackage['id']
+            offset + index, datapackage['id'], names_format
         )
+        if summary_statistics:
+            result['summary'] = write_summary_statistics(
+                samples, dirpath, offset + index, datapackage['id'])
         datapackage['resources'].append(result)
 
     with open(dirpath / "datapackage.json", "w", encoding='utf-8') as f:
@@ -513,6 +563,27 @@ def append_presamples_package(dirpath, matrix_data=None, parameter_data=None, co
     return datapackage['id'], dirpath
 
 
+def pre_index_matrix_data(indices, metadata, lca):
+    """Resolve the row and column indices of ``indices`` in place with the dictionaries of ``lca``.
+
+    ``lca`` is an object (usually an LCA) with the row and column dictionaries
+    named in ``metadata`` as attributes. Returns the fingerprints of the
+    dictionaries, to be stored in the resource metadata, or an empty dictionary
+    if ``lca`` doesn't have all the needed dictionaries."""
+    prefixes = [prefix for prefix in ('row', 'col') if prefix + ' dict' in metadata]
+    if not all(hasattr(lca, metadata[prefix + ' dict']) for prefix in prefixes):
+        return {}
+    fingerprints = {}
+    for prefix in prefixes:
+        lookup = LOOKUP_CACHE.get(getattr(lca, metadata[prefix + ' dict']), verify=True)
+        lookup(
+            indices[metadata[prefix + ' from label']],
+            indices[metadata[prefix + ' to label']]
+        )
+        fingerprints[prefix + ' dict fingerprint'] = lookup.fingerprint
+    return fingerprints
+
+
 def write_matrix_data(samples, indices, metadata, kind, dirpath, index, id_):
     samples_fp = "{}.{}.samples.npy".format(id_, index)
     indices_fp = "{}.{}.indices.npy".format(id_, index)
@@ -542,13 +613,55 @@ def write_matrix_data(samples, indices, metadata, kind, dirpath, index, id_):
     return result
 
 
-def write_parameter_data(samples, names, label, dirpath, index, id_):
-    samples_fp = "{}.{}.samples.npy".format(id_, index)
-    names_fp = "{}.{}.names.json".format(id_, index)
+def compute_summary_statistics(samples, quantiles=SUMMARY_QUANTILES, chunk_size=4096):
+    """Compute per-row summary statistics of the 2-d array ``samples``.
+
+    Returns a structured array with one element per row, and the fields
+    ``mean``, ``std``, ``min``, ``max`` and ``quantiles`` (the values at
+    ``quantiles``). Rows are processed in chunks of ``chunk_size`` to bound the
+    temporary memory used for the quantiles."""
+    result = np.zeros(samples.shape[0], dtype=[
+        ('mean', '<f8'), ('std', '<f8'), ('min', '<f8'), ('max', '<f8'),
+        ('quantiles', '<f8', (len(quantiles),)),
+    ])
+    for start in range(0, samples.shape[0], chunk_size):
+        chunk = np.asarray(samples[start:start + chunk_size], dtype=np.float64)
+        out = result[start:start + chunk_size]
+        out['mean'] = chunk.mean(axis=1)
+        out['std'] = chunk.std(axis=1)
+        out['min'] = chunk.min(axis=1)
+        out['max'] = chunk.max(axis=1)
+        out['quantiles'] = np.quantile(chunk, quantiles, axis=1).T
+    return result
+
+
+def write_summary_statistics(samples, dirpath, index, id_):
+    summary_fp = "{}.{}.summary.npy".format(id_, index)
+    np.save(dirpath / summary_fp, compute_summary_statistics(samples), allow_pickle=False)
+    return {
+        'filepath': summary_fp,
+        'md5': md5(dirpath / summary_fp),
+        'quantiles': list(SUMMARY_QUANTILES),
+        "format": "npy",
+        "mediatype": "application/octet-stream",
+    }
+
 
+def write_parameter_data(samples, names, label, dirpath, index, id_, names_format="json"):
+    samples_fp = "{}.{}.samples.npy".format(id_, index)
     np.save(dirpath / samples_fp, samples, allow_pickle=False)
-    with open(dirpath / names_fp, "w", encoding='utf-8') as f:
-        json.dump(names, f, ensure_ascii=False)
+
+    if names_format == "json":
+        names_fp = "{}.{}.names.json".format(id_, index)
+        with open(dirpath / names_fp, "w", encoding='utf-8') as f:
+            json.dump(names, f, ensure_ascii=False)
+        names_format, mediatype = "json", "application/json"
+    elif names_format == "binary":
+        names_fp = "{}.{}.names.bin".format(id_, index)
+        write_names(dirpath / names_fp, names)
+        names_format, mediatype = "psnames", "application/octet-stream"
+    else:
+        raise ValueError("Unknown names format: {}".format(names_format))
 
     return {
         'samples': {
@@ -562,8 +675,8 @@ def write_parameter_data(samples, names, label, dirpath, index, id_):
         'names': {
             'filepath': names_fp,
             'md5': md5(dirpath / names_fp),
-            "format": "json",
-            "mediatype": "application/json"
+            "format": names_format,
+            "mediatype": mediatype
         },
         "profile": "data-resource",
         "label": label,
@@ -0,0 +1,194 @@
+"""Aggregate statistics over presample arrays which don't fit in memory.
+
+Functions in this module accept either a ``RegularPresamplesArrays`` or a
+``PresamplesPackage``. For a package, statistics are computed over its named
+parameters, and ``rows`` can be given as parameter names.
+
+Arrays are read in chunks of at most ``max_memory`` bytes: row statistics and
+ranks over chunks of rows, covariances and histograms over chunks of columns.
+Chunks are processed by ``threads`` worker threads (default is one per CPU), and
+combined so that results don't depend on the chunk size.
+
+"""
+from .array import MmapPool, RegularPresamplesArrays
+from .packaging import SUMMARY_QUANTILES, compute_summary_statistics
+from concurrent.futures import ThreadPoolExecutor
+from scipy.stats import rankdata
+import numpy as np
+import os
+import tempfile
+
+# Default maximum size of a chunk read from the presample arrays, in bytes
+MAX_MEMORY = 2**26
+
+
+def _resolve(source, rows):
+    """Return (``RegularPresamplesArrays``, array of row indices)"""
+    if isinstance(source, RegularPresamplesArrays):
+        ipa = source
+        rows = np.arange(ipa.start_indices[-1]) if rows is None else rows
+    else:
+        parameters = source.parameters
+        ipa = parameters.ipa
+        if rows is None:
+            rows = np.arange(len(parameters))
+        else:
+            rows = [parameters.row(row) if isinstance(row, str) else row for row in rows]
+    rows = np.asarray(rows, dtype=np.int64).ravel()
+    ipa.translate_rows(rows)
+    return ipa, rows
+
+
+def _chunks(total, size):
+    size = max(1, int(size))
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def _map(func, chunks, threads):
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as executor:
+        return list(executor.map(lambda chunk: func(*chunk), chunks))
+
+
+def row_statistics(source, rows=None, quantiles=SUMMARY_QUANTILES,
+                   max_memory=MAX_MEMORY, threads=None):
+    """Mean, standard deviation, minimum, maximum and ``quantiles`` of each row.
+
+    Returns a structured array in the order of ``rows``, with the same fields
+    as the summary statistics stored by ``create_presamples_package``."""
+    ipa, rows = _resolve(source, rows)
+    columns = np.arange(ipa.ncols)
+    chunk_size = max_memory // (8 * max(1, ipa.ncols))
+
+    def summarize(start, stop):
+        return compute_summary_statistics(
+            ipa.sample_block(columns, rows[start:stop]), quantiles
+        )
+
+    results = _map(summarize, _chunks(len(rows), chunk_size), threads)
+    return np.concatenate(results) if results else compute_summary_statistics(
+        np.zeros((0, 1)), quantiles
+    )
+
+
+def _moments(block):
+    """Number of columns, row means, and centered cross products of ``block``"""
+    block = np.asarray(block, dtype=np.float64)
+    mean = block.mean(axis=1)
+    centered = block - mean[:, None]
+    return block.shape[1], mean, centered @ centered.T
+
+
+def _combine_moments(results):
+    """Combine the moments of column chunks (Chan et al. pairwise update)"""
+    n, mean, m2 = results[0]
+    for n_b, mean_b, m2_b in results[1:]:
+        delta = mean_b - mean
+        total = n + n_b
+        m2 = m2 + m2_b + np.outer(delta, delta) * (n * n_b / total)
+        mean = mean + delta * (n_b / total)
+        n = total
+    return n, mean, m2
+
+
+def _covariance(ipa, rows, max_memory, threads, ddof=1):
+    chunk_size = max_memory // (8 * max(1, len(rows)))
+
+    def moments(start, stop):
+        return _moments(ipa.sample_block(np.arange(start, stop), rows))
+
+    n, _, m2 = _combine_moments(_map(moments, _chunks(ipa.ncols, chunk_size), threads))
+    return m2 / (n - ddof)
+
+
+def covariance(source, rows=None, ddof=1, max_memory=MAX_MEMORY, threads=None):
+    """Covariance matrix between ``rows``, computed over all columns.
+
+    Returns an array of shape ``(len(rows), len(rows))``."""
+    ipa, rows = _resolve(source, rows)
+    return _covariance(ipa, rows, max_memory, threads, ddof)
+
+
+def _correlation(cov):
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.outer(std, std)
+
+
+def correlation(source, rows=None, method="pearson", max_memory=MAX_MEMORY, threads=None):
+    """Correlation matrix between ``rows``, computed over all columns.
+
+    ``method`` is either "pearson" or "spearman" (rank correlation). Rank
+    correlations first rank each row, with ties given their average rank, into
+    a temporary memory-mapped file, and then correlate the ranks.
+
+    Rows with constant values have a correlation of ``nan``."""
+    ipa, rows = _resolve(source, rows)
+    if method == "pearson":
+        return _correlation(_covariance(ipa, rows, max_memory, threads))
+    elif method != "spearman":
+        raise ValueError("Unknown correlation method: {}".format(method))
+
+    columns = np.arange(ipa.ncols)
+    chunk_size = max_memory // (8 * max(1, ipa.ncols))
+    with tempfile.TemporaryDirectory() as dirpath:
+        filepath = dirpath + "/ranks.npy"
+        ranks = np.lib.format.open_memmap(
+            filepath, mode='w+', dtype=np.float64, shape=(len(rows), ipa.ncols)
+        )
+
+        def rank(ranks, start, stop):
+            ranks[start:stop] = rankdata(ipa.sample_block(columns, rows[start:stop]), axis=1)
+
+        _map(
+            rank,
+            [(ranks,) + chunk for chunk in _chunks(len(rows), chunk_size)],
+            threads
+        )
+        ranks.flush()
+        del ranks
+        # Private pool, so that the temporary file doesn't stay mapped in ``MMAP_POOL``
+        pool = MmapPool(max_open=None)
+        result = _correlation(_covariance(
+            RegularPresamplesArrays([filepath], pool=pool),
+            np.arange(len(rows)), max_memory, threads
+        ))
+        pool.clear()
+    return result
+
+
+def histogram(source, rows=None, bins=10, range=None, max_memory=MAX_MEMORY, threads=None):
+    """Histogram of the values of each row, with ``bins`` equal-width bins.
+
+    The bins of each row span ``range`` (a ``(min, max)`` tuple), or by default
+    the minimum and maximum of the row, found in a first pass over the data.
+    Values outside ``range`` are ignored.
+
+    Returns a tuple (counts, bin edges), with arrays of shape
+    ``(len(rows), bins)`` and ``(len(rows), bins + 1)``."""
+    ipa, rows = _resolve(source, rows)
+    if range is None:
+        stats = row_statistics(ipa, rows, quantiles=(), max_memory=max_memory, threads=threads)
+        low, high = stats['min'], stats['max']
+    else:
+        low = np.full(len(rows), range[0], dtype=np.float64)
+        high = np.full(len(rows), range[1], dtype=np.float64)
+    # Like ``np.histogram``, constant rows get bins of width 1 around their value
+    constant = high == low
+    low, high = np.where(constant, low - 0.5, low), np.where(constant, high + 0.5, high)
+    width = (high - low) / bins
+    offsets = np.arange(len(rows))[:, None] * bins
+    chunk_size = max_memory // (16 * max(1, len(rows)))
+
+    def count(start, stop):
+        block = ipa.sample_block(np.arange(start, stop), rows).astype(np.float64)
+        inside = (block >= low[:, None]) & (block <= high[:, None])
+        # The last bin includes its upper edge
+        index = np.minimum(((block - low[:, None]) / width[:, None]).astype(np.int64), bins - 1)
+        return np.bincount(
+            (index + offsets)[inside], minlength=len(rows) * bins
+        ).reshape((len(rows), bins))
+
+    counts = sum(_map(count, _chunks(ipa.ncols, chunk_size), threads))
+    edges = low[:, None] + width[:, None] * np.arange(bins + 1)
+    edges[:, -1] = high
+    return counts, edges
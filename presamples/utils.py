@@ -34,27 +34,43 @@ def convert_parameter_dict_to_presamples(parameters):
     return names, np.vstack([parameters[key].reshape((1, -1)) for key in names])
 
 
-def validate_presamples_dirpath(path):
-    """Check that a ``dirpath`` has a valid `datapackage.json` file and data files with matching hashes."""
+def validate_presamples_resource(path, resource, check_hash=True):
+    """Check that the data files of ``resource`` in package at ``path`` exist and are intact.
+
+    If ``check_hash``, the MD5 hash of each file is compared with the one in
+    the metadata. Otherwise, only the size of the samples array is checked,
+    which doesn't read the data files."""
+    path = Path(path)
+    for key in ('samples', 'indices', 'names', 'summary'):
+        if key not in resource:
+            continue
+        filepath = path / resource[key]['filepath']
+        assert os.path.isfile(filepath), "{} missing".format(filepath)
+        if check_hash:
+            assert md5(filepath) == resource[key]['md5'], \
+                "{} doesn't match its MD5 hash".format(filepath)
+    if not check_hash and 'shape' in resource['samples']:
+        nbytes = int(np.prod(resource['samples']['shape'])) * \
+            np.dtype(resource['samples']['dtype']).itemsize
+        filepath = path / resource['samples']['filepath']
+        assert os.path.getsize(filepath) >= nbytes, \
+            "{} is smaller than its shape".format(filepath)
+
+
+def validate_presamples_dirpath(path, check_resources=True):
+    """Check that a ``dirpath`` has a valid `datapackage.json` file and data files with matching hashes.
+
+    If not ``check_resources``, only the `datapackage.json` file is checked."""
     path = Path(path)
     assert os.path.isdir(path)
-    files = list(os.listdir(path))
-    assert "datapackage.json" in files, "{} missing a datapackage file".format(path)
-    metadata = json.load(
-        open(path / "datapackage.json")
-    )
+    assert os.path.isfile(path / "datapackage.json"), \
+        "{} missing a datapackage file".format(path)
+    if not check_resources:
+        return
+    with open(path / "datapackage.json", encoding='utf-8') as f:
+        metadata = json.load(f)
     for resource in metadata['resources']:
-        assert os.path.isfile(path / resource['samples']['filepath'])
-        assert md5(path / resource['samples']['filepath']) == \
-            resource['samples']['md5']
-        if 'indices' in resource:
-            assert os.path.isfile(path / resource['indices']['filepath'])
-            assert md5(path / resource['indices']['filepath']) == \
-                resource['indices']['md5']
-        if 'names' in resource:
-            assert os.path.isfile(path / resource['names']['filepath'])
-            assert md5(path / resource['names']['filepath']) == \
-                resource['names']['md5']
+        validate_presamples_resource(path, resource)
 
 
 def check_name_conflicts(lists):
@@ -70,3 +70,25 @@ def test_sequential_reset():
     assert i.count == 10
     assert i.index == 9
 
+
+def test_peek_does_not_change_sequence():
+    i = Indexer(1e6, seed=12345)
+    a = [next(i) for _ in range(10)]
+    i = Indexer(1e6, seed=12345)
+    b = []
+    for _ in range(10):
+        peeked = i.peek()
+        assert i.peek() == peeked
+        b.append(next(i))
+        assert b[-1] == peeked
+    assert a == b
+    assert i.count == 10
+
+def test_peek_sequential():
+    i = Indexer(5, seed='sequential')
+    assert i.peek() == 0
+    assert i.index is None
+    assert next(i) == 0
+    assert i.peek() == 1
+    i.reset_sequential_indices()
+    assert i.peek() == 0
@@ -0,0 +1,65 @@
+from presamples.indexing import *
+import numpy as np
+import pytest
+
+
+def test_mapping_lookup():
+    lookup = MappingLookup({10: 0, 3: 1, 7: 2})
+    array_to = np.zeros(5, dtype=np.uint32)
+    lookup(np.array([3, 7, 10, 4, 11]), array_to)
+    assert array_to.tolist() == [1, 2, 0, MAX_INT_32, MAX_INT_32]
+    assert lookup(np.array([7])).tolist() == [2]
+
+def test_mapping_lookup_empty():
+    assert MappingLookup({})(np.array([1, 2])).tolist() == [MAX_INT_32] * 2
+
+def test_mapping_lookup_same_as_bw2calc():
+    indexing = pytest.importorskip("bw2calc.indexing")
+    keys = np.random.choice(10000, size=500, replace=False)
+    mapping = {int(k): i for i, k in enumerate(keys)}
+    array_from = np.random.randint(0, 12000, size=1000).astype(np.uint32)
+    expected = np.zeros(1000, dtype=np.uint32)
+    indexing.index_with_arrays(array_from, expected, mapping)
+    given = np.zeros(1000, dtype=np.uint32)
+    MappingLookup(mapping)(array_from, given)
+    assert np.array_equal(given, expected)
+
+def test_fingerprint():
+    assert MappingLookup({1: 2, 3: 4}).fingerprint == MappingLookup({3: 4, 1: 2}).fingerprint
+    assert MappingLookup({1: 2, 3: 4}).fingerprint != MappingLookup({1: 2, 3: 5}).fingerprint
+
+def test_lookup_cache():
+    cache = LookupCache(max_size=2)
+    first, second, third = {1: 0}, {2: 0}, {3: 0}
+    lookup = cache.get(first)
+    assert cache.get(first) is lookup
+    first[4] = 1
+    assert cache.get(first) is not lookup
+    assert len(cache.get(first)) == 2
+    cache.get(second)
+    cache.get(third)
+    assert len(cache) == 2
+    cache.clear()
+    assert not len(cache)
+
+def test_lookup_cache_verify():
+    cache = LookupCache()
+    mapping = {1: 0, 2: 1}
+    lookup = cache.get(mapping)
+    assert lookup.matches(mapping)
+    # Edited in place, same length
+    mapping[2] = 5
+    assert not lookup.matches(mapping)
+    assert cache.get(mapping) is lookup
+    fresh = cache.get(mapping, verify=True)
+    assert fresh is not lookup
+    assert fresh(np.array([2])).tolist() == [5]
+    assert fresh.fingerprint != lookup.fingerprint
+    assert cache.get(mapping, verify=True) is fresh
+
+def test_index_arrays_with_lookup():
+    lookup = MappingLookup({1: 10, 2: 20})
+    a, b = np.zeros(2, dtype=np.uint32), np.zeros(3, dtype=np.uint32)
+    index_arrays_with_lookup([(np.array([2, 1]), a), (np.array([1, 5, 2]), b)], lookup)
+    assert a.tolist() == [20, 10]
+    assert b.tolist() == [10, MAX_INT_32, 20]
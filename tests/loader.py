@@ -795,3 +795,669 @@ def test_consolidated_indexed_parameter_arrays(parameters_fixture, parameters_fi
     assert mp_3.parameters.replaced['B'] == [(parameters_fixture, 'foo')]
     assert mp_3.parameters.replaced['C'] == [(parameters_fixture, 'foo')]
     assert mp_3.parameters.replaced['E'] == [(parameters_fixture, 'foo'), (parameters_fixture_2, 'nufoo')]
+
+@pytest.fixture
+def grouped_packages(tempdir):
+    a = np.arange(20).reshape((2, 10))
+    b = np.arange(20).reshape((2, 10)) + 100
+    _, first = create_presamples_package(
+        parameter_data=[(a, ['a1', 'a2'], 'a')], dirpath=tempdir,
+        id_='first', seed=1, indexer_group='run'
+    )
+    _, second = create_presamples_package(
+        parameter_data=[(b, ['b1', 'b2'], 'b')], dirpath=tempdir,
+        id_='second', seed=2, indexer_group='run'
+    )
+    _, third = create_presamples_package(
+        parameter_data=[(b, ['c1', 'c2'], 'c')], dirpath=tempdir,
+        id_='third', seed=3
+    )
+    return first, second, third
+
+def test_indexer_group_in_datapackage(grouped_packages):
+    first, second, third = grouped_packages
+    assert json.load(open(first / "datapackage.json"))['indexer group'] == 'run'
+    assert 'indexer group' not in json.load(open(third / "datapackage.json"))
+    mp = PackagesDataLoader([first, second, third])
+    assert mp.package_indexers[0] is mp.package_indexers[1]
+    assert mp.package_indexers[0] is not mp.package_indexers[2]
+    for _ in range(10):
+        mp.update_package_indices()
+        assert mp.parameters['a1'] + 100 == mp.parameters['b1']
+
+def test_indexer_group_advanced_once(grouped_packages):
+    first, second, _ = grouped_packages
+    mp = PackagesDataLoader([first, second], seed='sequential')
+    assert mp.package_indexers[0].count == 1
+    mp.update_package_indices()
+    assert mp.package_indexers[0].count == 2
+    assert mp.package_indexers[0].index == 1
+    mp.reset_sequential_indices()
+    assert mp.package_indexers[1].index == 0
+
+def test_indexer_groups_at_construction(grouped_packages):
+    first, second, third = grouped_packages
+    mp = PackagesDataLoader(
+        [first, second, third], indexer_groups=[['first', third]]
+    )
+    assert mp.package_indexers[0] is mp.package_indexers[2]
+    assert mp.package_indexers[0] is not mp.package_indexers[1]
+    for _ in range(10):
+        mp.update_package_indices()
+        assert mp.parameters['a1'] + 100 == mp.parameters['c1']
+
+def test_indexer_group_inconsistent_ncols(grouped_packages, tempdir):
+    first, _, _ = grouped_packages
+    _, other = create_presamples_package(
+        parameter_data=[(np.ones((1, 3)), ['d'], 'd')], dirpath=tempdir,
+        indexer_group='run'
+    )
+    with pytest.raises(InconsistentSampleNumber):
+        PackagesDataLoader([first, other])
+
+def test_read_ahead_sequential_only(grouped_packages):
+    first, second, third = grouped_packages
+    mp = PackagesDataLoader([first, third], read_ahead=3)
+    assert mp.parameter_data_loaded[0]['parameter-data'].ipa.block_size is None
+    mp = PackagesDataLoader(
+        [first, third], seed='sequential', read_ahead=3,
+        read_ahead_background=True
+    )
+    ipm = mp.parameter_data_loaded[0]['parameter-data']
+    assert ipm.ipa.block_size == 3
+    for index in range(15):
+        assert np.allclose(ipm.array, [index % 10, index % 10 + 10])
+        mp.update_package_indices()
+
+@bw2test
+def test_prefetch_same_results():
+    mapping.add('ABCDEF')
+    t1 = [('A', 'A', 0), ('A', 'B', 1), ('B', 'C', 3), ('C', 'D', 1)]
+    t2 = np.random.random(size=(4, 50))
+    _, dirpath = create_presamples_package([(t2, t1, 'technosphere')], seed=42)
+
+    class LCA:
+        def __init__(self):
+            self.technosphere_matrix = dok_matrix((5, 5))
+            self._activity_dict = {x: x-1 for x in range(1, 7)}
+            self._product_dict = self._activity_dict
+
+    serial, prefetched = LCA(), LCA()
+    first = PackagesDataLoader([dirpath])
+    second = PackagesDataLoader([dirpath], prefetch=True)
+    first.index_arrays(serial)
+    second.index_arrays(prefetched)
+    for _ in range(20):
+        first.update_matrices(serial)
+        second.update_matrices(prefetched)
+        assert np.allclose(
+            serial.technosphere_matrix.toarray(),
+            prefetched.technosphere_matrix.toarray()
+        )
+        assert serial.technosphere_matrix[0, 1] < 0
+    assert first.matrix_indexer[0].index == second.matrix_indexer[0].index
+
+def test_prefetch_discarded_when_indices_moved(tempdir):
+    a = np.arange(30).reshape((3, 10))
+    b = [(1, 1), (1, 2), (2, 3)]
+    metadata = {
+        'row from label': 'f1',
+        'row to label': 'f3',
+        'row dict': 'row_dict',
+        'col from label': 'f2',
+        'col to label': 'f4',
+        'col dict': 'col_dict',
+        'matrix': 'matrix'
+    }
+    frmt = lambda x: (x[0], x[1], x[0], x[1])
+    dtype = [
+        ('f1', np.uint32),
+        ('f2', np.uint32),
+        ('f3', np.uint32),
+        ('f4', np.uint32),
+    ]
+    _, dirpath = create_presamples_package(
+        [(a, b, 'mock', dtype, frmt, metadata)], seed='sequential',
+        dirpath=tempdir
+    )
+    mp = PackagesDataLoader([dirpath], prefetch=True)
+    lca = MockLCA()
+    mp.update_matrices(lca)
+    assert lca.matrix[1, 1] == 1
+    mp.update_matrices(lca, matrices=['matrix'])
+    assert lca.matrix[1, 1] == 1
+    mp.update_matrices(lca)
+    assert lca.matrix[1, 1] == 2
+    mp.reset_sequential_indices()
+    mp.update_matrices(lca)
+    assert lca.matrix[1, 1] == 0
+    assert lca.matrix[2, 3] == 20
+
+def test_mmap_advice_and_prewarm(grouped_packages):
+    first, second, third = grouped_packages
+    mp = PackagesDataLoader(
+        [first, second, third], mmap_advice=True, prewarm=True
+    )
+    assert mp.prewarm(threads=2) > 0
+    mp.update_package_indices()
+    assert mp.parameters['a1'] + 100 == mp.parameters['b1']
+
+def test_memory_policy(package, grouped_packages):
+    first, _, _ = grouped_packages
+    policy = MemoryPolicy(budget=160)
+    mp = PackagesDataLoader([package, first], memory_policy=policy)
+    ipa = mp.parameter_data_loaded[0]['parameter-data'].ipa
+    assert not isinstance(ipa.data[0], np.memmap)
+    assert isinstance(
+        mp.matrix_data_loaded[0]['matrix-data'][0]['samples'].data[0],
+        np.memmap
+    )
+    assert policy.used == 160
+
+def test_consolidated_lookup_and_array(parameters_fixture, parameters_fixture_2, parameters_fixture_3):
+    mp = PackagesDataLoader([parameters_fixture, parameters_fixture_2, parameters_fixture_3])
+    params = mp.parameters
+    for _ in range(5):
+        mp.update_package_indices()
+        expected = np.array([
+            params.ipms[params.ipm_mapper[name]][name] for name in params.names
+        ])
+        assert np.array_equal(params.consolidated_array, expected)
+        for name in params.names:
+            assert params[name] == expected[params.position(name)]
+    assert 'E' in params
+    assert 'Z' not in params
+    with pytest.raises(KeyError):
+        params['Z']
+    assert params.get('Z') is None
+
+def test_consolidated_array_rows_planned_once(monkeypatch, parameters_fixture, parameters_fixture_2):
+    mp = PackagesDataLoader([parameters_fixture, parameters_fixture_2])
+    params = mp.parameters
+    planned = []
+    plan_rows = RegularPresamplesArrays.plan_rows
+    monkeypatch.setattr(
+        RegularPresamplesArrays, 'plan_rows',
+        lambda self, rows: planned.append(rows) or plan_rows(self, rows)
+    )
+    for _ in range(3):
+        mp.update_package_indices()
+        expected = np.array([
+            params.ipms[params.ipm_mapper[name]][name] for name in params.names
+        ])
+        assert np.array_equal(params.consolidated_array, expected)
+    assert not planned
+
+def test_consolidate_many_overridden_names(tempdir):
+    names = ["p{}".format(i) for i in range(20000)]
+    _, first = create_presamples_package(
+        parameter_data=[(np.zeros((20000, 2)), names, 'all')],
+        dirpath=tempdir, name='first'
+    )
+    _, second = create_presamples_package(
+        parameter_data=[(np.ones((10000, 2)), names[::2], 'even')],
+        dirpath=tempdir, name='second'
+    )
+    mp = PackagesDataLoader([first, second])
+    params = mp.parameters
+    assert params.names == names
+    assert len(params.replaced) == 10000
+    assert params.replaced['p0'] == [(first, 'first')]
+    assert 'p1' not in params.replaced
+    assert params.ids['p0'] == (second, 'second', 'p0')
+    assert params.ipm_mapper['p1'] == 0
+    assert params.consolidated_array.sum() == 10000
+
+def test_parameters_block(parameters_fixture, parameters_fixture_2):
+    mp = PackagesDataLoader([parameters_fixture])
+    ipm = mp.parameter_data_loaded[0]['parameter-data']
+    block = ipm.block([0, 3, 1])
+    assert block.shape == (7, 3)
+    assert block[:, 0].tolist() == [0, 4, 8, 12, 0, 4, 8]
+    assert block[:, 1].tolist() == [3, 7, 11, 15, 3, 7, 11]
+
+    mp = PackagesDataLoader([parameters_fixture, parameters_fixture_2])
+    block = mp.parameters.block([[0, 3], [0, 0]])
+    assert block.shape == (7, 2)
+    assert block.flags['C_CONTIGUOUS']
+    assert block[:, 0].tolist() == [100, 200, 8, 12, 42, 4, 8]
+    assert block[:, 1].tolist() == [100, 200, 11, 15, 42, 7, 11]
+    for _ in range(3):
+        mp.update_package_indices()
+        column = mp.parameters.block(
+            [[ipm.index] for ipm in mp.parameters.ipms]
+        )[:, 0]
+        assert np.array_equal(column, mp.parameters.consolidated_array)
+    with pytest.raises(ValueError):
+        mp.parameters.block([[0], [0], [0]])
+
+def test_binary_names_parameters(tempdir, parameters_fixture):
+    s = np.array([100, 200]).reshape(2, 1)
+    _, binary = create_presamples_package(
+        parameter_data=[(s, list('AH'), 'spring')], dirpath=tempdir,
+        name='binary', names_format='binary'
+    )
+    mp = PackagesDataLoader([parameters_fixture, binary])
+    assert mp.parameters.names == list('ABCDEFGH')
+    assert mp.parameters['A'] == 100
+    assert mp.parameters['H'] == 200
+    assert mp.parameters.replaced['A'] == [(parameters_fixture, 'foo')]
+    assert mp.parameters.consolidated_array[[0, 7]].tolist() == [100, 200]
+
+def test_index_arrays_shares_lookups(package):
+    from presamples.indexing import LOOKUP_CACHE
+    LOOKUP_CACHE.clear()
+    lca = MockLCA()
+    first, second = PackagesDataLoader([package]), PackagesDataLoader([package, package])
+    first.index_arrays(lca)
+    second.index_arrays(lca)
+    # One lookup for each of the row and col dictionaries
+    assert len(LOOKUP_CACHE) == 2
+    assert (first.matrix_data_loaded[0]['matrix-data'][0]['indices'].tolist() ==
+            second.matrix_data_loaded[1]['matrix-data'][0]['indices'].tolist())
+
+def test_index_arrays_reused_across_lcas(package):
+    from presamples.indexing import INDICES_CACHE
+    INDICES_CACHE.clear()
+    first, second = MockLCA(), MockLCA()
+    mp = PackagesDataLoader([package])
+    mp.index_arrays(first)
+    assert INDICES_CACHE.misses == 1 and INDICES_CACHE.hits == 0
+    other = PackagesDataLoader([package])
+    other.index_arrays(second)
+    assert INDICES_CACHE.hits == 1
+    expected = [(1, 1, 2, 3), (1, 2, 2, 6), (2, 3, 4, 9)]
+    assert other.matrix_data_loaded[0]['matrix-data'][0]['indices'].tolist() == expected
+
+    # Different dictionary, indices are computed again
+    third = MockLCA()
+    third.row_dict = {x: x for x in range(5)}
+    last = PackagesDataLoader([package])
+    last.index_arrays(third)
+    assert INDICES_CACHE.misses == 2
+    expected = [(1, 1, 1, 3), (1, 2, 1, 6), (2, 3, 2, 9)]
+    assert last.matrix_data_loaded[0]['matrix-data'][0]['indices'].tolist() == expected
+
+def test_index_arrays_dictionary_edited_in_place(package):
+    from presamples.indexing import INDICES_CACHE
+    INDICES_CACHE.clear()
+    lca = MockLCA()
+    PackagesDataLoader([package]).index_arrays(lca)
+    # Same length, different values
+    lca.row_dict[1] = 4
+    mp = PackagesDataLoader([package])
+    mp.index_arrays(lca)
+    assert INDICES_CACHE.hits == 0
+    expected = [(1, 1, 4, 3), (1, 2, 4, 6), (2, 3, 4, 9)]
+    assert mp.matrix_data_loaded[0]['matrix-data'][0]['indices'].tolist() == expected
+
+def _pre_indexed_package(dirpath, lca):
+    metadata = {
+        'row from label': 'f1', 'row to label': 'f3', 'row dict': 'row_dict',
+        'col from label': 'f2', 'col to label': 'f4', 'col dict': 'col_dict',
+        'matrix': 'matrix'
+    }
+    dtype = [('f1', np.uint32), ('f2', np.uint32), ('f3', np.uint32), ('f4', np.uint32)]
+    _, dirpath = create_presamples_package(
+        [(np.ones((3, 4)), [(1, 1), (1, 2), (2, 3)], 'mock', dtype,
+          lambda x: (x[0], x[1], 0, 0), metadata)],
+        dirpath=dirpath, pre_index=lca
+    )
+    return dirpath
+
+def test_pre_indexed_package(tempdir):
+    from presamples.indexing import INDICES_CACHE
+    INDICES_CACHE.clear()
+    dirpath = _pre_indexed_package(tempdir, MockLCA())
+    resource = json.load(open(dirpath / "datapackage.json"))['resources'][0]
+    assert resource['row dict fingerprint'] and resource['col dict fingerprint']
+    expected = [(1, 1, 2, 3), (1, 2, 2, 6), (2, 3, 4, 9)]
+    assert np.load(dirpath / resource['indices']['filepath']).tolist() == expected
+
+    mp = PackagesDataLoader([dirpath])
+    mp.index_arrays(MockLCA())
+    assert mp.matrix_data_loaded[0]['matrix-data'][0]['indexed']
+    assert mp.matrix_data_loaded[0]['matrix-data'][0]['indices'].tolist() == expected
+    assert INDICES_CACHE.hits == INDICES_CACHE.misses == 0
+
+def test_pre_indexed_package_reindexed(tempdir):
+    dirpath = _pre_indexed_package(tempdir, MockLCA())
+    lca = MockLCA()
+    lca.col_dict = {x: x for x in range(5)}
+    mp = PackagesDataLoader([dirpath])
+    mp.index_arrays(lca)
+    expected = [(1, 1, 2, 1), (1, 2, 2, 2), (2, 3, 4, 3)]
+    assert mp.matrix_data_loaded[0]['matrix-data'][0]['indices'].tolist() == expected
+
+def test_pre_index_missing_dictionary(tempdir):
+    lca = MockLCA()
+    del lca.col_dict
+    dirpath = _pre_indexed_package(tempdir, lca)
+    resource = json.load(open(dirpath / "datapackage.json"))['resources'][0]
+    assert 'row dict fingerprint' not in resource
+    assert np.load(dirpath / resource['indices']['filepath'])['f3'].tolist() == [0, 0, 0]
+
+@bw2test
+def test_unmapped_cells_dropped():
+    mapping.add('ABCDEF')
+    t1 = [('A', 'A', 0), ('F', 'B', 1), ('B', 'C', 1), ('C', 'F', 1)]
+    t2 = np.arange(8).reshape((4, 2)) + 10
+    _, dirpath = create_presamples_package([(t2, t1, 'technosphere')])
+
+    class LCA:
+        def __init__(self):
+            self.technosphere_matrix = dok_matrix((5, 5))
+            # 'F' is not in the LCA
+            self._activity_dict = {x: x-1 for x in range(1, 6)}
+            self._product_dict = self._activity_dict
+
+    lca = LCA()
+    mp = PackagesDataLoader([dirpath], seed='sequential')
+    mp.index_arrays(lca)
+    assert mp.unmapped == {(dirpath, 'technosphere_matrix'): 2}
+    elem = mp.matrix_data_loaded[0]['matrix-data'][0]
+    assert elem['rows'].tolist() == [0, 2]
+    # Sequential indexer, advanced to the second column
+    mp.update_matrices(lca)
+    assert lca.technosphere_matrix[0, 0] == 11
+    assert lca.technosphere_matrix[1, 2] == -15
+    assert lca.technosphere_matrix.nnz == 2
+
+def test_all_cells_mapped(package):
+    mp = PackagesDataLoader([package])
+    mp.index_arrays(MockLCA())
+    assert mp.unmapped == {}
+    assert mp.matrix_data_loaded[0]['matrix-data'][0]['rows'] is None
+
+def test_selective_parameter_groups(parameters_fixture):
+    mp = PackagesDataLoader([parameters_fixture], parameter_groups=['summer'])
+    assert sorted(mp.parameters) == list('EFG')
+    assert not mp.require(parameter_groups=['summer'])
+    assert mp.require(parameter_groups=['winter'])
+    assert sorted(mp.parameters) == list('ABCDEFG')
+    assert mp.parameters['A'] == mp.parameters.ipms[0]['A']
+
+def test_selective_loading_skips_validation(parameters_fixture):
+    metadata = json.load(open(parameters_fixture / "datapackage.json"))
+    winter = [obj for obj in metadata['resources'] if obj['label'] == 'winter'][0]
+    np.save(parameters_fixture / winter['samples']['filepath'], np.zeros((4, 4)))
+    with pytest.raises(AssertionError):
+        PackagesDataLoader([parameters_fixture])
+    mp = PackagesDataLoader([parameters_fixture], parameter_groups=['summer'])
+    with pytest.raises(AssertionError):
+        mp.require(parameter_groups=['winter'])
+
+def _two_matrices_package(dirpath):
+    metadata = {
+        'row from label': 'f1', 'row to label': 'f3', 'row dict': 'row_dict',
+        'col from label': 'f2', 'col to label': 'f4', 'col dict': 'col_dict',
+    }
+    dtype = [('f1', np.uint32), ('f2', np.uint32), ('f3', np.uint32), ('f4', np.uint32)]
+    frmt = lambda x: (x[0], x[1], 0, 0)
+    _, dirpath = create_presamples_package([
+        (np.ones((1, 4)), [(1, 1)], 'first', dtype, frmt, dict(metadata, matrix='matrix')),
+        (np.ones((1, 4)) * 2, [(1, 1)], 'second', dtype, frmt, dict(metadata, matrix='other')),
+    ], dirpath=dirpath)
+    return dirpath
+
+def test_selective_matrices(tempdir):
+    dirpath = _two_matrices_package(tempdir)
+    lca = MockLCA()
+    lca.other = dok_matrix((5, 5))
+    mp = PackagesDataLoader([dirpath], matrices=['matrix'])
+    assert [elem['matrix'] for elem in mp.matrix_data_loaded[0]['matrix-data']] == ['matrix']
+    mp.index_arrays(lca)
+    mp.update_matrices(lca, matrices=['matrix'])
+    assert lca.matrix[2, 3] == 1
+    assert lca.other.sum() == 0
+
+    # Deferred resources are loaded and indexed when required
+    mp.update_matrices(lca, matrices=['other'])
+    assert lca.other[2, 3] == 2
+    assert mp.matrices == {'matrix', 'other'}
+    elem = mp.matrix_data_loaded[0]['matrix-data'][-1]
+    assert elem['matrix'] == 'other' and elem['indexed']
+
+def test_selective_matrices_all_deferred(tempdir):
+    dirpath = _two_matrices_package(tempdir)
+    mp = PackagesDataLoader([dirpath], matrices=[])
+    assert mp.matrix_data_loaded == []
+    assert not mp.empty
+
+def _overlapping_packages(dirpath, count=6):
+    metadata = {
+        'row from label': 'f1', 'row to label': 'f3', 'row dict': 'row_dict',
+        'col from label': 'f2', 'col to label': 'f4', 'col dict': 'col_dict',
+        'matrix': 'matrix'
+    }
+    dtype = [('f1', np.uint32), ('f2', np.uint32), ('f3', np.uint32), ('f4', np.uint32)]
+    frmt = lambda x: (x[0], x[1], 0, 0)
+    dirpaths = []
+    for i in range(count):
+        _, path = create_presamples_package(
+            [(np.random.random((3, 10)), [(1, 1), (i % 2, 1), (1, 1)], 'mock', dtype, frmt, metadata)],
+            dirpath=dirpath, id_='package-{}'.format(i), seed=i,
+            collapse_repeated_indices=False,
+        )
+        dirpaths.append(path)
+    return dirpaths
+
+def test_threaded_gather_same_as_serial(tempdir):
+    dirpaths = _overlapping_packages(tempdir)
+    serial, threaded = MockLCA(), MockLCA()
+    first = PackagesDataLoader(dirpaths)
+    second = PackagesDataLoader(dirpaths, threads=4)
+    first.index_arrays(serial)
+    second.index_arrays(threaded)
+    for _ in range(5):
+        first.update_matrices(serial)
+        second.update_matrices(threaded)
+        assert np.array_equal(serial.matrix.toarray(), threaded.matrix.toarray())
+
+def test_single_write_last_package_wins(tempdir):
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    lca = MockLCA()
+    mp = PackagesDataLoader(dirpaths, seed='sequential')
+    mp.index_arrays(lca)
+    mp.update_matrices(lca)
+    last = np.load(dirpaths[1] / 'package-1.0.samples.npy')
+    # Cell (1, 1) is mapped to (2, 3), and last written by the last package
+    assert lca.matrix[2, 3] == last[2, 1]
+    assert lca.matrix[0, 3] == np.load(dirpaths[0] / 'package-0.0.samples.npy')[1, 1]
+
+@bw2test
+def test_technosphere_signs_computed_once(monkeypatch):
+    mapping.add('ABCDEF')
+    t1 = [('A', 'A', 0), ('A', 'B', 1), ('B', 'C', 3), ('C', 'D', 1)]
+    t2 = np.arange(8).reshape((4, 2)) + 10
+    _, dirpath = create_presamples_package([(t2, t1, 'technosphere')])
+
+    class LCA:
+        def __init__(self):
+            self.technosphere_matrix = dok_matrix((5, 5))
+            self._activity_dict = {x: x-1 for x in range(1, 7)}
+            self._product_dict = self._activity_dict
+
+    lca = LCA()
+    mp = PackagesDataLoader([dirpath], seed='sequential')
+    mp.index_arrays(lca)
+    elem = mp.matrix_data_loaded[0]['matrix-data'][0]
+    assert elem['signs'].tolist() == [1, -1, 1, -1]
+
+    from bw2calc.matrices import TechnosphereBiosphereMatrixBuilder as MB
+    def fail(*args):
+        raise AssertionError
+    monkeypatch.setattr(MB, 'get_technosphere_inputs_mask', fail)
+    monkeypatch.setattr(MB, 'fix_supply_use', fail)
+    mp.update_matrices(lca)
+    assert lca.technosphere_matrix[0, 1] == -13
+    assert lca.technosphere_matrix[1, 2] == 15
+    assert lca.technosphere_matrix[2, 3] == -17
+
+def test_update_plan_gathers_winning_rows_only(tempdir):
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    lca = MockLCA()
+    mp = PackagesDataLoader(dirpaths, seed='sequential')
+    mp.index_arrays(lca)
+    mp.update_matrices(lca)
+    elems = [obj['matrix-data'][0] for obj in mp.matrix_data_loaded]
+    plan = mp._update_plan('matrix', elems)
+    assert plan['size'] == 2
+    assert [part[0].rows.tolist() for part in plan['parts']] == [[1], [2]]
+    assert sorted(zip(plan['rows'].tolist(), plan['cols'].tolist())) == [(0, 3), (2, 3)]
+
+def test_update_plan_csr_data_positions(tempdir):
+    from scipy.sparse import csr_matrix
+    dirpaths = _overlapping_packages(tempdir)
+    expected, lca = MockLCA(), MockLCA()
+    lca.matrix = csr_matrix(np.ones((5, 5)))
+    first = PackagesDataLoader(dirpaths)
+    second = PackagesDataLoader(dirpaths)
+    first.index_arrays(expected)
+    second.index_arrays(lca)
+    for _ in range(3):
+        # Rebuilt with the same structure, like ``MonteCarloLCA``
+        lca.matrix = csr_matrix(np.ones((5, 5)))
+        first.update_matrices(expected)
+        second.update_matrices(lca)
+        plan = second._update_plan('matrix', [
+            obj['matrix-data'][0] for obj in second.matrix_data_loaded
+        ])
+        assert plan['structures'][-1][2] is not None
+        assert lca.matrix.nnz == 25
+        dense = np.ones((5, 5))
+        dense[[0, 2], [3, 3]] = expected.matrix.toarray()[[0, 2], [3, 3]]
+        assert np.array_equal(lca.matrix.toarray(), dense)
+
+@pytest.mark.filterwarnings("ignore::scipy.sparse.SparseEfficiencyWarning")
+def test_update_plan_csr_missing_cells(tempdir):
+    from scipy.sparse import csr_matrix
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    expected, lca = MockLCA(), MockLCA()
+    lca.matrix = csr_matrix((5, 5))
+    first = PackagesDataLoader(dirpaths, seed='sequential')
+    second = PackagesDataLoader(dirpaths, seed='sequential')
+    first.index_arrays(expected)
+    second.index_arrays(lca)
+    first.update_matrices(expected)
+    second.update_matrices(lca)
+    assert np.array_equal(lca.matrix.toarray(), expected.matrix.toarray())
+
+def test_update_several_lcas(tempdir):
+    from scipy.sparse import csr_matrix
+    dirpaths = _overlapping_packages(tempdir)
+    expected, first, second = MockLCA(), MockLCA(), MockLCA()
+    # Different sparsity structures
+    structure = np.eye(5)
+    structure[[0, 2], [3, 3]] = 1
+    second.matrix = csr_matrix(structure)
+    single = PackagesDataLoader(dirpaths)
+    mp = PackagesDataLoader(dirpaths)
+    single.index_arrays(expected)
+    mp.index_arrays([first, second])
+    for _ in range(3):
+        single.update_matrices(expected)
+        mp.update_matrices([first, second])
+        assert np.array_equal(first.matrix.toarray(), expected.matrix.toarray())
+        cells = ([0, 2], [3, 3])
+        assert np.array_equal(second.matrix.toarray()[cells], expected.matrix.toarray()[cells])
+        assert second.matrix.nnz == 7
+
+def test_update_several_lcas_different_dictionaries(tempdir):
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    first, second = MockLCA(), MockLCA()
+    second.col_dict = {x: 4 - x for x in range(5)}
+    mp = PackagesDataLoader(dirpaths)
+    mp.index_arrays(first)
+    with pytest.raises(ValueError):
+        mp.update_matrices((first, second))
+
+def test_update_plan_recompiled_after_indexing(package):
+    lca = MockLCA()
+    lca.row_dict, lca.col_dict = {1: 0, 2: 1}, {1: 0, 2: 1, 3: 2}
+    mp = PackagesDataLoader([package])
+    # Written with the raw indices, before indexing
+    mp.update_matrices(lca)
+    mp.index_arrays(lca)
+    lca.matrix = dok_matrix((5, 5))
+    mp.update_matrices(lca)
+    assert sorted(lca.matrix.keys()) == [(0, 0), (0, 1), (1, 2)]
+
+@pytest.mark.parametrize("col_dict", [None, {x: 3 * x for x in range(1, 5)}])
+def test_prefetch_before_indexing_discarded(tempdir, col_dict):
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    expected, lca = MockLCA(), MockLCA()
+    if col_dict is not None:
+        expected.col_dict = lca.col_dict = col_dict
+    first = PackagesDataLoader(dirpaths)
+    second = PackagesDataLoader(dirpaths, prefetch=True)
+    if second._prefetched is not None:
+        # Gathered with the unindexed resources
+        second._prefetched[1].result()
+    first.index_arrays(expected)
+    second.index_arrays(lca)
+    for _ in range(3):
+        first.update_matrices(expected)
+        second.update_matrices(lca)
+        assert np.array_equal(lca.matrix.toarray(), expected.matrix.toarray())
+
+def test_prefetch_starts_after_indexing(tempdir):
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    lca = MockLCA()
+    mp = PackagesDataLoader(dirpaths, prefetch=True)
+    assert mp._prefetched is None
+    mp.index_arrays(lca)
+    mp.update_matrices(lca)
+    assert mp._prefetched is not None
+    # Indexing again discards the prefetched samples
+    mp.index_arrays(lca)
+    assert mp._prefetched is None
+
+def test_close_shuts_down_workers(tempdir):
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    lca = MockLCA()
+    mp = PackagesDataLoader(dirpaths, prefetch=True, threads=2)
+    mp.index_arrays(lca)
+    mp.update_matrices(lca)
+    threads = list(mp._prefetch_executor._threads) + list(mp._gather_executor._threads)
+    assert threads
+    mp.close()
+    assert mp._prefetch_executor is None and mp._gather_executor is None
+    assert not any(thread.is_alive() for thread in threads)
+    mp.update_matrices(lca)
+
+def test_several_lcas_checked_once(tempdir, monkeypatch):
+    import presamples.loader
+    dirpaths = _overlapping_packages(tempdir, count=2)
+    lcas = [MockLCA() for _ in range(10)]
+    mp = PackagesDataLoader(dirpaths)
+    mp.index_arrays(lcas[0])
+    built = []
+    class CountingLookup(presamples.loader.MappingLookup):
+        def __init__(self, mapping):
+            built.append(mapping)
+            super().__init__(mapping)
+    monkeypatch.setattr(presamples.loader, 'MappingLookup', CountingLookup)
+    mp.update_matrices(lcas)
+    assert len(built) == 20
+    for _ in range(3):
+        mp.update_matrices(lcas)
+    assert len(built) == 20
+    # Replaced dictionaries are checked again
+    lcas[3].col_dict = {x: 4 - x for x in range(5)}
+    with pytest.raises(ValueError):
+        mp.update_matrices(lcas)
+
+def test_package_overwritten_then_reloaded(tempdir):
+    create_presamples_package(
+        parameter_data=[(np.ones((1, 3)), ['a'], 'group')],
+        id_='same', dirpath=tempdir, seed='sequential',
+    )
+    old = PackagesDataLoader([tempdir / 'same'])
+    assert old.parameters['a'] == 1
+    create_presamples_package(
+        parameter_data=[(np.ones((1, 3)) * 7, ['a'], 'group')],
+        id_='same', dirpath=tempdir, seed='sequential', overwrite=True,
+    )
+    new = PackagesDataLoader([tempdir / 'same'])
+    assert new.parameters['a'] == 7
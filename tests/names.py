@@ -0,0 +1,51 @@
+from presamples.errors import NameConflicts
+from presamples.names import NamesIndex, write_names
+from pathlib import Path
+import pytest
+import tempfile
+
+
+@pytest.fixture
+def dirpath():
+    with tempfile.TemporaryDirectory() as d:
+        yield Path(d)
+
+def test_roundtrip(dirpath):
+    names = ['a', 'foo', 'bär', 'group__param', '']
+    write_names(dirpath / "n.bin", names)
+    ni = NamesIndex(dirpath / "n.bin")
+    assert len(ni) == 5
+    assert list(ni) == names
+    assert ni[2] == 'bär'
+    assert ni[-1] == ''
+    assert ni[1:3] == ['foo', 'bär']
+    with pytest.raises(IndexError):
+        ni[5]
+
+def test_lookup(dirpath):
+    names = ["p{}".format(i) for i in range(1000)]
+    write_names(dirpath / "n.bin", names)
+    ni = NamesIndex(dirpath / "n.bin")
+    for i, name in enumerate(names):
+        assert ni.index(name) == i
+        assert name in ni
+    assert 'missing' not in ni
+    assert ni.get('missing') is None
+    with pytest.raises(ValueError):
+        ni.index('missing')
+
+def test_empty(dirpath):
+    write_names(dirpath / "n.bin", [])
+    ni = NamesIndex(dirpath / "n.bin")
+    assert len(ni) == 0
+    assert 'a' not in ni
+
+def test_duplicates(dirpath):
+    with pytest.raises(NameConflicts):
+        write_names(dirpath / "n.bin", ['a', 'b', 'a'])
+
+def test_not_a_names_file(dirpath):
+    with open(dirpath / "n.bin", "wb") as f:
+        f.write(b"0" * 64)
+    with pytest.raises(ValueError):
+        NamesIndex(dirpath / "n.bin")
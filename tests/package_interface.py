@@ -1,6 +1,8 @@
 from presamples import create_presamples_package, Indexer
 from presamples.package_interface import *
+import json
 import numpy as np
+import os
 import pytest
 import tempfile
 try:
@@ -123,3 +125,81 @@ def test_indexed_parameter_array(parameters_package):
     pp = PresamplesPackage(parameters_package)
     p = IndexedParametersMapping(pp.path, pp.resources, pp.name)
     assert np.allclose(np.array([0, 4, 8, 12, 0, 4, 8]), p.array)
+
+
+@pytest.fixture
+def parameters_only_package():
+    with tempfile.TemporaryDirectory() as d:
+        id_, dirpath = create_presamples_package(
+            parameter_data=[(np.arange(12).reshape((3, 4)), list('ABC'), 'winter')],
+            name='foo', id_='bar', dirpath=d, seed=42
+        )
+        yield dirpath
+
+def test_metadata_cached(parameters_only_package):
+    pp = PresamplesPackage(parameters_only_package)
+    assert pp.metadata is pp.metadata
+
+def test_metadata_reloaded_when_file_changes(parameters_only_package):
+    pp = PresamplesPackage(parameters_only_package)
+    assert pp.name == 'foo'
+    metadata = json.load(open(parameters_only_package / "datapackage.json"))
+    metadata['name'] = 'a much longer name'
+    with open(parameters_only_package / "datapackage.json", "w") as f:
+        json.dump(metadata, f)
+    assert pp.name == 'a much longer name'
+
+def test_change_seed_updates_cached_metadata(parameters_only_package):
+    pp = PresamplesPackage(parameters_only_package)
+    before = pp.metadata
+    pp.change_seed(88)
+    assert pp.seed == 88
+    assert before['seed'] == 42
+    assert PresamplesPackage(parameters_only_package).seed == 88
+
+@pytest.fixture
+def two_resources_package():
+    with tempfile.TemporaryDirectory() as d:
+        id_, dirpath = create_presamples_package(
+            parameter_data=[
+                (np.arange(12).reshape((3, 4)), list('ABC'), 'winter'),
+                (np.arange(8).reshape((2, 4)), list('DE'), 'summer'),
+            ],
+            name='foo', id_='bar', dirpath=d, seed=42
+        )
+        yield dirpath
+
+def _samples_filepath(dirpath, i):
+    metadata = json.load(open(dirpath / "datapackage.json"))
+    return dirpath / metadata['resources'][i]['samples']['filepath']
+
+def test_lazy_package_skips_hashes(two_resources_package):
+    fp = _samples_filepath(two_resources_package, 1)
+    arr = np.load(fp)
+    np.save(fp, arr + 1)
+    with pytest.raises(AssertionError):
+        PresamplesPackage(two_resources_package)
+    pp = PresamplesPackage(two_resources_package, lazy=True)
+    assert pp.name == 'foo'
+    assert np.allclose(pp.parameters['E'], range(5, 9))
+    with pytest.raises(AssertionError):
+        pp.validate()
+
+def test_lazy_parameters_open_needed_resources(two_resources_package):
+    from presamples.array import MMAP_POOL
+    os.remove(_samples_filepath(two_resources_package, 1))
+    pp = PresamplesPackage(two_resources_package, lazy=True)
+    p = pp.parameters
+    assert len(p) == 5
+    assert np.allclose(p['B'], range(4, 8))
+    assert _samples_filepath(two_resources_package, 0) in MMAP_POOL
+    with pytest.raises(AssertionError):
+        p['D']
+
+def test_lazy_parameters_same_values(two_resources_package):
+    eager = PresamplesPackage(two_resources_package).parameters
+    lazy = PresamplesPackage(two_resources_package, lazy=True).parameters
+    assert list(lazy) == list(eager) == list('ABCDE')
+    assert 'E' in lazy and 'F' not in lazy
+    assert lazy.row('D') == eager.row('D') == 3
+    assert np.allclose(lazy.block([0, 3]), eager.block([0, 3]))
@@ -1,5 +1,6 @@
 from presamples import *
 from pathlib import Path
+import gc
 from scipy.sparse import *
 import numpy as np
 import pytest
@@ -98,3 +99,269 @@ def test_translate_row(arrays):
         assert ipa.translate_row(7)
     with pytest.raises(ValueError):
         assert ipa.translate_row(-1)
+
+def test_sample_out(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays(
+        [dirpath / "a.npy", dirpath / "b.npy"]
+    )
+    out = np.zeros(7)
+    result = ipa.sample(2, out=out)
+    assert result is out
+    assert np.allclose(out, np.hstack([a[:, 2], b[:, 2]]))
+
+def test_sample_buffer_reused(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays(
+        [dirpath / "a.npy", dirpath / "b.npy"]
+    )
+    assert ipa.buffer.shape == (7,)
+    assert ipa.buffer.dtype == np.float64
+    first = ipa.sample(0, out=ipa.buffer)
+    second = ipa.sample(1, out=ipa.buffer)
+    assert first is second is ipa.buffer
+    assert np.allclose(second, np.hstack([a[:, 1], b[:, 1]]))
+    assert ipa.sample(0) is not ipa.buffer
+
+def test_translate_rows(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays(
+        [dirpath / "a.npy", dirpath / "b.npy"]
+    )
+    array_indices, rows = ipa.translate_rows([6, 0, 5, 4])
+    assert array_indices.tolist() == [1, 0, 1, 0]
+    assert rows.tolist() == [1, 0, 0, 4]
+    for row in range(7):
+        assert ipa.translate_row(row) == tuple(
+            x[0] for x in ipa.translate_rows([row])
+        )
+
+    with pytest.raises(ValueError):
+        ipa.translate_rows([1, 7])
+    with pytest.raises(ValueError):
+        ipa.translate_rows([-1, 2])
+
+def test_sample_rows(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays(
+        [dirpath / "a.npy", dirpath / "b.npy"]
+    )
+    for index in range(5):
+        full = ipa.sample(index)
+        rows = [6, 1, 5, 3]
+        assert np.allclose(ipa.sample_rows(index, rows), full[rows])
+    assert ipa.sample_rows(0, []).shape == (0,)
+
+@pytest.mark.parametrize("background", [False, True])
+def test_read_ahead(dirpath, background):
+    a = np.random.random(size=(50, 11))
+    b = np.arange(33).reshape((3, 11))
+    np.save(dirpath / "a.npy", a, allow_pickle=False)
+    np.save(dirpath / "b.npy", b, allow_pickle=False)
+    expected = np.vstack([a, b])
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    ipa.read_ahead(4, background=background)
+    i = Indexer(11, 'sequential')
+    for _ in range(30):
+        index = next(i)
+        assert np.allclose(ipa.sample(index), expected[:, index])
+    for index in [3, 9, 0, 10, 5]:
+        assert np.allclose(ipa.sample(index, out=ipa.buffer), expected[:, index])
+
+    ipa.read_ahead(None)
+    assert ipa.block_size is None
+    assert np.allclose(ipa.sample(7), expected[:, 7])
+
+def test_read_ahead_block_larger_than_array(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    ipa.read_ahead(100, background=True)
+    for index in [0, 1, 4, 2]:
+        assert np.allclose(ipa.sample(index), np.hstack([a[:, index], b[:, index]]))
+
+def test_advise(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    for pattern in ("random", "sequential", "willneed", "normal"):
+        ipa.advise(pattern)
+    assert np.allclose(ipa.sample(1), np.hstack([a[:, 1], b[:, 1]]))
+    with pytest.raises(ValueError):
+        ipa.advise("backwards")
+
+def test_prewarm(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    assert ipa.prewarm() >= a.nbytes + b.nbytes
+    assert np.allclose(ipa.sample(1), np.hstack([a[:, 1], b[:, 1]]))
+
+def test_memory_policy_threshold(dirpath):
+    a = np.random.random(size=(500, 50))
+    b = np.arange(100).reshape((25, 4))
+    np.save(dirpath / "a.npy", a, allow_pickle=False)
+    np.save(dirpath / "b.npy", b, allow_pickle=False)
+    policy = MemoryPolicy(threshold=1000)
+    ipa = RegularPresamplesArrays(
+        [dirpath / "a.npy", dirpath / "b.npy"], memory_policy=policy
+    )
+    assert isinstance(ipa.data[0], np.memmap)
+    assert not isinstance(ipa.data[1], np.memmap)
+    assert policy.used == b.nbytes
+    assert np.allclose(ipa.data[1], b)
+
+def test_memory_policy_budget(arrays):
+    dirpath, a, b = arrays
+    policy = MemoryPolicy(budget=a.nbytes)
+    first = RegularPresamplesArrays([dirpath / "b.npy"], memory_policy=policy)
+    second = RegularPresamplesArrays([dirpath / "a.npy"], memory_policy=policy)
+    assert not isinstance(first.data[0], np.memmap)
+    assert isinstance(second.data[0], np.memmap)
+    assert policy.used == b.nbytes
+    policy.release(b.nbytes)
+    assert policy.used == 0
+
+def test_memory_policy_released_on_collection(arrays):
+    dirpath, a, b = arrays
+    policy = MemoryPolicy(budget=2 * b.nbytes)
+    for _ in range(5):
+        ipa = RegularPresamplesArrays([dirpath / "b.npy"], memory_policy=policy)
+        assert not isinstance(ipa.data[0], np.memmap)
+        assert policy.used == b.nbytes
+        del ipa
+        gc.collect()
+        assert policy.used == 0
+
+def test_pin(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    assert ipa.pin(0) == a.nbytes
+    assert ipa.pin(0) == 0
+    assert not isinstance(ipa.data[0], np.memmap)
+    assert np.allclose(ipa.sample(3), np.hstack([a[:, 3], b[:, 3]]))
+
+def test_mmap_pool_eviction(dirpath):
+    arrays = [np.random.random(size=(3, 4)) for _ in range(5)]
+    for i, arr in enumerate(arrays):
+        np.save(dirpath / "{}.npy".format(i), arr, allow_pickle=False)
+    pool = MmapPool(max_open=2)
+    ipa = RegularPresamplesArrays(
+        [dirpath / "{}.npy".format(i) for i in range(5)], pool=pool
+    )
+    assert len(pool) == 2
+    assert pool.opens == 5
+    assert pool.evictions == 3
+    for index in range(4):
+        assert np.allclose(ipa.sample(index), np.vstack(arrays)[:, index])
+    assert len(pool) == 2
+    assert pool.stats['open'] == 2
+    assert pool.opens == 25
+
+    ipa.array(4)
+    hits = pool.hits
+    ipa.array(4)
+    assert pool.hits == hits + 1
+    pool.clear()
+    assert not len(pool)
+    assert pool.stats == {'open': 0, 'opens': 0, 'hits': 0, 'evictions': 0}
+
+def test_mmap_pool_advice_reapplied(arrays, monkeypatch):
+    import presamples.array
+    dirpath, a, b = arrays
+    advised = []
+    monkeypatch.setattr(
+        presamples.array, '_madvise', lambda arr, pattern: advised.append(pattern)
+    )
+    pool = MmapPool(max_open=1)
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"], pool=pool)
+    ipa.advise("random")
+    assert advised == ["random", "random"]
+    # Both arrays are re-opened, and advised again
+    assert np.allclose(ipa.sample(1), np.hstack([a[:, 1], b[:, 1]]))
+    assert advised == ["random"] * 4
+    pool.discard([dirpath / "a.npy"])
+    ipa.array(0)
+    assert advised == ["random"] * 4
+
+def test_mmap_pool_shared(arrays):
+    dirpath, a, b = arrays
+    pool = MmapPool()
+    first = RegularPresamplesArrays([dirpath / "a.npy"], pool=pool)
+    second = RegularPresamplesArrays([dirpath / "a.npy"], pool=pool)
+    assert pool.opens == 1
+    assert first.array(0) is second.array(0)
+    first.pin(0)
+    # Still used by ``second``
+    assert dirpath / "a.npy" in pool
+    assert np.allclose(first.sample(1), second.sample(1))
+    del second
+    gc.collect()
+    assert dirpath / "a.npy" not in pool
+
+def test_mmap_pool_users(arrays):
+    dirpath, a, b = arrays
+    pool = MmapPool()
+    first = RegularPresamplesArrays([dirpath / "a.npy"], pool=pool)
+    first.advise("random")
+    second = RegularPresamplesArrays([dirpath / "a.npy"], pool=pool)
+    del second
+    gc.collect()
+    assert dirpath / "a.npy" in pool
+    assert pool._advice == {str(dirpath / "a.npy"): "random"}
+    del first
+    gc.collect()
+    assert dirpath / "a.npy" not in pool
+    assert not pool._advice
+
+def test_sample_block(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    expected = np.vstack([a, b])
+    block = ipa.sample_block([4, 0, 4])
+    assert block.shape == (7, 3)
+    assert block.flags['C_CONTIGUOUS']
+    assert np.allclose(block, expected[:, [4, 0, 4]])
+    block = ipa.sample_block([1, 2], rows=[6, 0, 5])
+    assert np.allclose(block, expected[[6, 0, 5]][:, [1, 2]])
+
+def test_plan_rows(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    full = np.vstack([a, b])
+    rows = [1, 2, 5, 6, 0]
+    plan = ipa.plan_rows(rows)
+    assert [part[0] for part in plan.parts] == [0, 1]
+    assert plan.parts[1][2] == slice(2, 4)
+    scale = np.arange(5) - 2.
+    out = np.empty(5)
+    for index in range(4):
+        assert ipa.sample_rows(index, plan, out=out) is out
+        assert np.allclose(out, full[rows, index])
+        assert np.allclose(ipa.sample_rows(index, plan, scale=scale), full[rows, index] * scale)
+    # Rows of one array, taken in place
+    plan = ipa.plan_rows([3, 4, 1])
+    assert plan.parts[0][2] == slice(0, 3)
+    assert np.allclose(ipa.sample_rows(2, plan, scale=scale[:3]), a[[3, 4, 1], 2] * scale[:3])
+    # Other output dtypes are cast
+    out = np.empty(5, dtype=np.float32)
+    assert np.allclose(ipa.sample_rows(3, ipa.plan_rows(rows), out=out), full[rows, 3])
+
+def test_sample_rows_read_ahead(arrays):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    ipa.read_ahead(2)
+    expected = np.vstack([a, b])
+    for index in range(5):
+        assert np.allclose(ipa.sample_rows(index, [6, 0, 3]), expected[[6, 0, 3], index])
+
+@pytest.mark.parametrize("block_size", [None, 2])
+def test_sample_scale(arrays, block_size):
+    dirpath, a, b = arrays
+    ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+    ipa.read_ahead(block_size)
+    scale = np.array([1, -1, 1, 1, -1, -1, 1])
+    expected = np.vstack([a, b])
+    for index in range(5):
+        assert np.allclose(ipa.sample(index, scale=scale), expected[:, index] * scale)
+        assert np.allclose(
+            ipa.sample_rows(index, [6, 1, 5], scale=scale[[6, 1, 5]]),
+            expected[[6, 1, 5], index] * scale[[6, 1, 5]]
+        )
@@ -0,0 +1,90 @@
+from presamples import *
+from presamples import stats
+from pathlib import Path
+from scipy.stats import spearmanr
+import numpy as np
+import pytest
+import tempfile
+
+
+@pytest.fixture
+def arrays():
+    with tempfile.TemporaryDirectory() as d:
+        dirpath = Path(d)
+        a = np.random.random(size=(4, 50))
+        b = np.random.randint(0, 5, size=(3, 50))
+        np.save(dirpath / "a.npy", a, allow_pickle=False)
+        np.save(dirpath / "b.npy", b, allow_pickle=False)
+        ipa = RegularPresamplesArrays([dirpath / "a.npy", dirpath / "b.npy"])
+        yield ipa, np.vstack([a, b])
+
+@pytest.mark.parametrize("max_memory", [64, stats.MAX_MEMORY])
+def test_row_statistics(arrays, max_memory):
+    ipa, data = arrays
+    result = stats.row_statistics(ipa, max_memory=max_memory, threads=2)
+    assert result.shape == (7,)
+    assert np.allclose(result['mean'], data.mean(axis=1))
+    assert np.allclose(result['std'], data.std(axis=1))
+    assert np.allclose(result['quantiles'][:, 2], np.median(data, axis=1))
+
+def test_row_statistics_rows(arrays):
+    ipa, data = arrays
+    result = stats.row_statistics(ipa, rows=[5, 1])
+    assert np.allclose(result['max'], data[[5, 1]].max(axis=1))
+
+@pytest.mark.parametrize("max_memory", [64, stats.MAX_MEMORY])
+def test_covariance(arrays, max_memory):
+    ipa, data = arrays
+    assert np.allclose(stats.covariance(ipa, max_memory=max_memory), np.cov(data))
+    assert np.allclose(
+        stats.covariance(ipa, rows=[6, 0], ddof=0, max_memory=max_memory),
+        np.cov(data[[6, 0]], ddof=0)
+    )
+
+@pytest.mark.parametrize("max_memory", [64, stats.MAX_MEMORY])
+def test_correlation(arrays, max_memory):
+    ipa, data = arrays
+    assert np.allclose(
+        stats.correlation(ipa, max_memory=max_memory, threads=3),
+        np.corrcoef(data)
+    )
+    assert np.allclose(
+        stats.correlation(ipa, method="spearman", max_memory=max_memory),
+        spearmanr(data, axis=1).correlation
+    )
+
+def test_correlation_unknown_method(arrays):
+    with pytest.raises(ValueError):
+        stats.correlation(arrays[0], method="kendall")
+
+def test_row_out_of_bounds(arrays):
+    with pytest.raises(ValueError):
+        stats.covariance(arrays[0], rows=[7])
+
+@pytest.mark.parametrize("max_memory", [64, stats.MAX_MEMORY])
+def test_histogram(arrays, max_memory):
+    ipa, data = arrays
+    counts, edges = stats.histogram(ipa, bins=4, max_memory=max_memory)
+    assert counts.shape == (7, 4)
+    assert edges.shape == (7, 5)
+    for row, c, e in zip(data, counts, edges):
+        expected, expected_edges = np.histogram(row, bins=4)
+        assert np.array_equal(c, expected)
+        assert np.allclose(e, expected_edges)
+
+def test_histogram_range(arrays):
+    ipa, data = arrays
+    counts, edges = stats.histogram(ipa, rows=[4], bins=2, range=(1, 3))
+    expected, expected_edges = np.histogram(data[4], bins=2, range=(1, 3))
+    assert np.array_equal(counts[0], expected)
+    assert np.allclose(edges[0], expected_edges)
+
+def test_package_names():
+    with tempfile.TemporaryDirectory() as d:
+        a = np.random.random(size=(3, 20))
+        _, dirpath = create_presamples_package(
+            parameter_data=[(a, list('ABC'), 'a')], dirpath=d
+        )
+        pp = PresamplesPackage(dirpath)
+        assert np.allclose(stats.covariance(pp, rows=['C', 'A']), np.cov(a[[2, 0]]))
+        assert np.allclose(stats.row_statistics(pp)['min'], a.min(axis=1))
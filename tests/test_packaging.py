@@ -1646,3 +1646,86 @@ def test_split_inventory_presamples_ginteger_types():
     assert y == [(1, 2, 1), (5, 6, 7), (7, 8, 0)]
     assert w == 'biosphere'
     assert z == 'technosphere'
+
+def test_binary_names_format():
+    with tempfile.TemporaryDirectory() as d:
+        s1 = np.arange(16).reshape((4, 4))
+        s2 = np.arange(8).reshape((2, 4))
+        _, dirpath = create_presamples_package(
+            parameter_data=[(s1, list('ABCD'), 'a'), (s2, list('EF'), 'b')],
+            id_='bar', dirpath=d, names_format='binary'
+        )
+        assert sorted(os.listdir(dirpath)) == [
+            'bar.0.names.bin', 'bar.0.samples.npy',
+            'bar.1.names.bin', 'bar.1.samples.npy',
+            'datapackage.json'
+        ]
+        resource = json.load(open(dirpath / 'datapackage.json'))['resources'][0]
+        assert resource['names']['format'] == 'psnames'
+        assert resource['names']['mediatype'] == 'application/octet-stream'
+
+        pp = PresamplesPackage(dirpath)
+        assert pp.parameters.names == list('ABCDEF')
+        assert 'F' in pp.parameters
+        assert 'G' not in pp.parameters
+        assert pp.parameters['F'].tolist() == [4, 5, 6, 7]
+        assert pp.parameters.row('E') == 4
+
+        with pytest.raises(NameConflicts):
+            append_presamples_package(
+                dirpath, parameter_data=[(s2, list('FG'), 'c')]
+            )
+        append_presamples_package(
+            dirpath, parameter_data=[(s2, list('GH'), 'c')]
+        )
+        assert PresamplesPackage(dirpath).parameters.names == list('ABCDEFGH')
+
+        with pytest.raises(ValueError):
+            create_presamples_package(
+                parameter_data=[(s1, list('ABCD'), 'a')], dirpath=d,
+                names_format='xml'
+            )
+
+def test_summary_statistics():
+    with tempfile.TemporaryDirectory() as d:
+        s1 = np.random.random(size=(3, 50))
+        s2 = np.random.random(size=(2, 50))
+        _, dirpath = create_presamples_package(
+            parameter_data=[(s1, list('ABC'), 'a')],
+            id_='bar', dirpath=d, summary_statistics=True
+        )
+        assert 'bar.0.summary.npy' in os.listdir(dirpath)
+        resource = json.load(open(dirpath / 'datapackage.json'))['resources'][0]
+        assert resource['summary']['quantiles'] == [0.05, 0.25, 0.5, 0.75, 0.95]
+
+        append_presamples_package(dirpath, parameter_data=[(s2, list('DE'), 'b')])
+        summaries = PresamplesPackage(dirpath).summaries
+        assert summaries[1] is None
+        assert np.allclose(summaries[0]['mean'], s1.mean(axis=1))
+        assert np.allclose(summaries[0]['std'], s1.std(axis=1))
+        assert np.allclose(summaries[0]['min'], s1.min(axis=1))
+        assert np.allclose(summaries[0]['max'], s1.max(axis=1))
+        assert np.allclose(summaries[0]['quantiles'][:, 2], np.median(s1, axis=1))
+
+        pp = PresamplesPackage(dirpath)
+        assert np.isclose(pp.parameters.summary('B')['max'], s1[1].max())
+        with pytest.raises(ValueError):
+            pp.parameters.summary('D')
+
+def test_summary_statistics_chunks():
+    from presamples.packaging import compute_summary_statistics
+    s = np.random.random(size=(10, 20))
+    assert np.array_equal(
+        compute_summary_statistics(s, chunk_size=3),
+        compute_summary_statistics(s)
+    )
+
+def test_summary_statistics_validated():
+    with tempfile.TemporaryDirectory() as d:
+        _, dirpath = create_presamples_package(
+            parameter_data=[(np.arange(8).reshape((2, 4)), list('AB'), 'a')],
+            id_='bar', dirpath=d, summary_statistics=True
+        )
+        np.save(dirpath / 'bar.0.summary.npy', np.zeros(2))
+        with pytest.raises(AssertionError):
+            PresamplesPackage(dirpath)